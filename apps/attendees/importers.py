@@ -0,0 +1,157 @@
+"""
+Streaming bulk import of attendees from CSV or JSON Lines.
+
+Rows are read lazily and handled in fixed-size chunks, so memory stays
+bounded by the chunk size however large the input is. Each row goes
+through the same field rules as AttendeeSerializer, but the per-row email
+uniqueness query is replaced by one `email IN (...)` lookup per chunk, and
+new attendees are written with `bulk_create`.
+"""
+import csv
+import io
+import json
+import time
+from itertools import islice
+
+from django.core.validators import EmailValidator
+from django.db import IntegrityError, transaction
+
+from .models import Attendee
+from .serializers import AttendeeSerializer
+
+FORMATS = ('csv', 'jsonl')
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+
+class AttendeeImportSerializer(AttendeeSerializer):
+    """AttendeeSerializer without the per-row email uniqueness query."""
+
+    class Meta(AttendeeSerializer.Meta):
+        extra_kwargs = {'email': {'validators': [EmailValidator()]}}
+
+
+class ImportStats:
+    """Running totals of an import, reported after every chunk."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.read = 0
+        self.created = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors = []
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def add_error(self, line, errors):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'read': self.read,
+            'created': self.created,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+            'seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+            'errors': self.errors,
+        }
+
+
+def detect_format(filename):
+    """Guess the format from a file name, defaulting to CSV."""
+    if filename and filename.lower().endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return 'csv'
+
+
+def iter_records(stream, fmt):
+    """Yield `(line_number, record)` pairs from a text stream."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                record = exc
+            yield line_number, record
+    else:
+        raise ValueError(f"Unsupported format {fmt!r}, expected one of {', '.join(FORMATS)}")
+
+
+def text_stream(binary):
+    """Wrap a binary file (e.g. an upload) for reading as UTF-8 text."""
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
+
+
+def _insert(attendees, batch_size):
+    with transaction.atomic():
+        Attendee.objects.bulk_create(attendees, batch_size=batch_size)
+
+
+def _import_chunk(chunk, stats, batch_size):
+    valid = {}
+    for line_number, record in chunk:
+        stats.read += 1
+        if not isinstance(record, dict):
+            stats.add_error(line_number, {'non_field_errors': ['Malformed row']})
+            continue
+        serializer = AttendeeImportSerializer(data=record)
+        if not serializer.is_valid():
+            stats.add_error(line_number, serializer.errors)
+            continue
+        email = serializer.validated_data['email']
+        if email in valid:
+            stats.duplicates += 1
+            continue
+        valid[email] = Attendee(**serializer.validated_data)
+
+    for attempt in range(2):
+        existing = set(
+            Attendee.objects.filter(email__in=list(valid)).values_list('email', flat=True)
+        )
+        new = [attendee for email, attendee in valid.items() if email not in existing]
+        try:
+            _insert(new, batch_size)
+        except IntegrityError:
+            # Someone registered one of these emails meanwhile; look again
+            if attempt:
+                raise
+            continue
+        stats.duplicates += len(valid) - len(new)
+        stats.created += len(new)
+        return
+
+
+def import_attendees(stream, fmt='csv', batch_size=DEFAULT_BATCH_SIZE, on_progress=None):
+    """
+    Import attendees from a text `stream` in chunks of `batch_size` rows.
+
+    Emails that already exist, in the database or earlier in the same
+    chunk, are skipped as duplicates. `on_progress(stats)` is called after
+    every chunk. Returns the final ImportStats.
+    """
+    stats = ImportStats()
+    records = iter_records(stream, fmt)
+    while True:
+        chunk = list(islice(records, batch_size))
+        if not chunk:
+            break
+        _import_chunk(chunk, stats, batch_size)
+        if on_progress is not None:
+            on_progress(stats)
+    return stats
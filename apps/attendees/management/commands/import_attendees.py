@@ -0,0 +1,47 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.attendees.importers import (
+    DEFAULT_BATCH_SIZE, FORMATS, detect_format, import_attendees, text_stream,
+)
+
+
+class Command(BaseCommand):
+    help = "Bulk import attendees from a CSV or JSON Lines file, skipping known emails."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or - to read standard input.")
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help="Input format (default: guessed from the file extension).",
+        )
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or detect_format(path)
+
+        def report(stats):
+            self.stdout.write(
+                f"{stats.read} rows read, {stats.created} created, "
+                f"{stats.duplicates} duplicates, {stats.invalid} invalid "
+                f"({stats.rows_per_second:.0f} rows/s)"
+            )
+
+        try:
+            binary = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        except OSError as exc:
+            raise CommandError(f"Cannot open {path}: {exc}")
+
+        with binary:
+            stats = import_attendees(
+                text_stream(binary), fmt, batch_size=options['batch_size'], on_progress=report
+            )
+
+        for error in stats.errors:
+            self.stderr.write(f"Line {error['line']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats.created} attendees in {stats.elapsed:.1f}s."
+        ))
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("attendees", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="attendee",
+            index=models.Index(
+                fields=["last_name", "first_name", "id"], name="attendee_name_id_idx"
+            ),
+        ),
+    ]
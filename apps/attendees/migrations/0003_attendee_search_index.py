@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from core.search import FullTextIndex
+
+INDEX = FullTextIndex('attendees_attendee', ['first_name', 'last_name', 'email'])
+
+
+def install(apps, schema_editor):
+    INDEX.install(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    INDEX.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("attendees", "0002_keyset_pagination_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -14,6 +14,10 @@ class Attendee(models.Model):
 
     class Meta:
         ordering = ['last_name', 'first_name']
+        indexes = [
+            # Keyset pagination walks (last_name, first_name, id)
+            models.Index(fields=['last_name', 'first_name', 'id'], name='attendee_name_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.email})"
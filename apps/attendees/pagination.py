@@ -0,0 +1,5 @@
+from core.pagination import SelectablePagination
+
+
+class AttendeePagination(SelectablePagination):
+    ordering = ('last_name', 'first_name', 'id')
@@ -1,9 +1,10 @@
 from rest_framework import serializers
+from core.serializers import DynamicFieldsMixin
 from .models import Attendee
 from datetime import date
 
 
-class AttendeeSerializer(serializers.ModelSerializer):
+class AttendeeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     full_name = serializers.ReadOnlyField()
 
     class Meta:
@@ -13,6 +14,7 @@ class AttendeeSerializer(serializers.ModelSerializer):
             'date_of_birth', 'full_name', 'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
+        source_fields = {'full_name': ['first_name', 'last_name']}
 
     def validate_date_of_birth(self, value):
         if value > date.today():
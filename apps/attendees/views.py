@@ -1,13 +1,21 @@
-from rest_framework import viewsets, filters
+from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
+from core.mixins import ConditionalGetMixin, SparseFieldsetMixin
+from core.search import FullTextSearchFilter
+from core.serializers import restrict_queryset
+from . import importers
 from .models import Attendee
+from .pagination import AttendeePagination
 from .serializers import AttendeeSerializer
+from apps.bookings.exports import export_bookings
 from apps.bookings.serializers import BookingSerializer
 
 
-class AttendeeViewSet(viewsets.ModelViewSet):
+class AttendeeViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing attendees.
     No authentication required for registration.
@@ -15,13 +23,48 @@ class AttendeeViewSet(viewsets.ModelViewSet):
     queryset = Attendee.objects.all()
     serializer_class = AttendeeSerializer
     permission_classes = [AllowAny]
-    filter_backends = [filters.SearchFilter]
+    pagination_class = AttendeePagination
+    filter_backends = [FullTextSearchFilter]
     search_fields = ['first_name', 'last_name', 'email']
+    query_budgets = {'list': 5, 'retrieve': 4, 'bookings': 4}
 
     @action(detail=True, methods=['get'])
     def bookings(self, request, pk=None):
-        """Get all bookings for a specific attendee."""
+        """
+        Get all bookings for a specific attendee.
+
+        `?export=csv` or `?export=ndjson` streams them as a file instead.
+        """
         attendee = self.get_object()
-        bookings = attendee.bookings.select_related('event')
-        serializer = BookingSerializer(bookings, many=True)
+        export = request.query_params.get('export')
+        if export:
+            return export_bookings(
+                attendee.bookings.all(), export, f'attendee-{attendee.pk}-bookings'
+            )
+
+        context = self.get_serializer_context()
+        bookings = restrict_queryset(
+            attendee.bookings.with_details(), BookingSerializer(context=context)
+        )
+        serializer = BookingSerializer(bookings, many=True, context=context)
         return Response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='import',
+        parser_classes=[MultiPartParser],
+        permission_classes=[IsAdminUser],
+    )
+    def import_file(self, request):
+        """Bulk import attendees from an uploaded CSV or JSON Lines file."""
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': ['No file was submitted.']})
+
+        fmt = request.data.get('format') or importers.detect_format(upload.name)
+        if fmt not in importers.FORMATS:
+            raise ValidationError({'format': [f'Expected one of {", ".join(importers.FORMATS)}.']})
+
+        stats = importers.import_attendees(importers.text_stream(upload.file), fmt)
+        return Response(stats.as_dict(), status=status.HTTP_200_OK)
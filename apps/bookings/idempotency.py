@@ -0,0 +1,88 @@
+"""
+Replay of booking writes retried with the same `Idempotency-Key` header.
+
+The first request with a key claims it and, once handled, stores its
+status and body. A retry with the same key and the same request gets that
+stored response back (marked `Idempotent-Replayed: true`) without running
+validation or the reservation service again. Keys are scoped per user and
+kept for `IDEMPOTENCY_KEY_TTL` seconds.
+"""
+import hashlib
+import json
+from functools import partial
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, separators=(',', ':'), cls=DjangoJSONEncoder)
+    return hashlib.sha256(f'{request.method}|{request.path}|{body}'.encode()).hexdigest()
+
+
+class IdempotencyMixin:
+    """
+    Make the `idempotent_actions` of a viewset safe to retry.
+
+    Requests without the header are handled as usual. Server errors are not
+    stored, so a retry after one runs the action again.
+    """
+    idempotent_actions = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.idempotent_actions and HEADER in request.headers:
+            # Route the action through the key check; dispatch looks the
+            # handler up again after initial()
+            method = request.method.lower()
+            setattr(self, method, partial(self.idempotent_response, getattr(self, method)))
+
+    def idempotent_response(self, handler, request, *args, **kwargs):
+        key = request.headers[HEADER]
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise ValidationError({HEADER: f"Must be between 1 and {MAX_KEY_LENGTH} characters."})
+
+        fingerprint = request_fingerprint(request)
+        record, claimed = IdempotencyKey.objects.claim(request.user, key, fingerprint)
+        if not claimed:
+            return self.replay(record, fingerprint)
+
+        try:
+            try:
+                response = handler(request, *args, **kwargs)
+            except Exception as exc:
+                # Store handled API errors (e.g. "already booked") like any other response
+                response = self.handle_exception(exc)
+        except Exception:
+            record.delete()
+            raise
+
+        if status.is_server_error(response.status_code):
+            record.delete()
+        else:
+            record.status_code = response.status_code
+            record.response = response.data
+            record.save(update_fields=['status_code', 'response'])
+        return response
+
+    def replay(self, record, fingerprint):
+        if record.fingerprint != fingerprint:
+            return Response(
+                {'detail': f"This {HEADER} was already used for a different request."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        if record.status_code is None:
+            return Response(
+                {'detail': f"A request with this {HEADER} is still being processed."},
+                status=status.HTTP_409_CONFLICT
+            )
+        response = Response(record.response, status=record.status_code)
+        response['Idempotent-Replayed'] = 'true'
+        return response
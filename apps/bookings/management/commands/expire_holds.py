@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.bookings.reservations import expire_holds
+
+
+class Command(BaseCommand):
+    help = "Expire pending bookings whose seat hold has run out and release their seats."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--every',
+            type=float,
+            metavar='SECONDS',
+            help="Keep running, sweeping again every SECONDS (default: sweep once).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            expired = expire_holds(batch_size=options['batch_size'])
+            if expired or not options['every']:
+                self.stdout.write(self.style.SUCCESS(f"Expired {expired} hold(s)."))
+            if not options['every']:
+                return
+            time.sleep(options['every'])
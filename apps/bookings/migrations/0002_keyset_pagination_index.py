@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("attendees", "0002_keyset_pagination_index"),
+        ("bookings", "0001_initial"),
+        ("events", "0003_keyset_pagination_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["-booking_date", "id"], name="booking_date_id_idx"
+            ),
+        ),
+    ]
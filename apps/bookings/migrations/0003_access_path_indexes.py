@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("attendees", "0002_keyset_pagination_index"),
+        ("bookings", "0002_keyset_pagination_index"),
+        ("events", "0004_access_path_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["event", "status"], name="booking_event_status_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["status", "-booking_date"], name="booking_status_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                condition=models.Q(("status", "confirmed")),
+                fields=["event"],
+                name="booking_confirmed_event_idx",
+            ),
+        ),
+    ]
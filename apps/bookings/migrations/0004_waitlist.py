@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("attendees", "0002_keyset_pagination_index"),
+        ("bookings", "0003_access_path_indexes"),
+        ("events", "0004_access_path_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="booking",
+            name="waitlist_position",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name="booking",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("confirmed", "Confirmed"),
+                    ("cancelled", "Cancelled"),
+                    ("waitlisted", "Waitlisted"),
+                ],
+                default="pending",
+                max_length=20,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="booking",
+            constraint=models.UniqueConstraint(
+                fields=("event", "waitlist_position"),
+                name="booking_waitlist_position_uniq",
+            ),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:15
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def start_holds(apps, schema_editor):
+    """Existing pending bookings start holding their seat from now."""
+    Booking = apps.get_model("bookings", "Booking")
+    Event = apps.get_model("events", "Event")
+    hold = timedelta(seconds=getattr(settings, "BOOKING_HOLD_SECONDS", 900))
+    Booking.objects.filter(status="pending").update(hold_expires_at=timezone.now() + hold)
+    pending = (
+        Booking.objects.filter(event=OuterRef("pk"), status="pending")
+        .order_by()
+        .values("event")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    Event.objects.update(held_count=Coalesce(Subquery(pending), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("attendees", "0002_keyset_pagination_index"),
+        ("bookings", "0004_waitlist"),
+        ("events", "0005_event_held_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="booking",
+            name="hold_expires_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name="booking",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("confirmed", "Confirmed"),
+                    ("cancelled", "Cancelled"),
+                    ("waitlisted", "Waitlisted"),
+                    ("expired", "Expired"),
+                ],
+                default="pending",
+                max_length=20,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                condition=models.Q(("status", "pending")),
+                fields=["hold_expires_at"],
+                name="booking_hold_expiry_idx",
+            ),
+        ),
+        migrations.RunPython(start_holds, migrations.RunPython.noop),
+    ]
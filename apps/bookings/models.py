@@ -1,37 +1,198 @@
-from django.db import models
-from django.core.exceptions import ValidationError
-from apps.events.models import Event
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from apps.events.models import Event, SeatUnavailable
 from apps.attendees.models import Attendee
 
 
+class BookingQuerySet(models.QuerySet):
+    def with_details(self):
+        """
+        Join everything BookingSerializer renders for a booking.
+
+        Shared by every endpoint that lists bookings so a page of bookings
+        renders in a constant number of queries, whatever its size.
+        """
+        return self.select_related('event__created_by', 'attendee')
+
+    def next_waitlist_position(self, event_id):
+        """
+        The position a booking joining the event's waitlist now should take.
+
+        Locks the event row where the backend supports it so two concurrent
+        joiners cannot be handed the same position.
+        """
+        if connection.features.has_select_for_update:
+            list(Event.objects.select_for_update().filter(pk=event_id).values_list('pk'))
+        last = self.filter(event_id=event_id).aggregate(last=Max('waitlist_position'))['last']
+        return (last or 0) + 1
+
+
 class Booking(models.Model):
     """Model for event bookings."""
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('confirmed', 'Confirmed'),
         ('cancelled', 'Cancelled'),
+        ('waitlisted', 'Waitlisted'),
+        ('expired', 'Expired'),
     ]
+    # Which event counter a booking in each status takes a seat from
+    SEAT_COUNTERS = {'confirmed': 'confirmed_count', 'pending': 'held_count'}
 
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='bookings')
     attendee = models.ForeignKey(Attendee, on_delete=models.CASCADE, related_name='bookings')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # Place in the event's waitlist (first come, first served) while waitlisted
+    waitlist_position = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    # A pending booking holds its seat until then; expire_holds releases it
+    hold_expires_at = models.DateTimeField(null=True, blank=True, editable=False)
     booking_date = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = BookingQuerySet.as_manager()
+
     class Meta:
         unique_together = ['event', 'attendee']  # Prevents duplicate bookings
         ordering = ['-booking_date']
+        constraints = [
+            # One booking per place in line; also the index promotion reads
+            models.UniqueConstraint(
+                fields=['event', 'waitlist_position'], name='booking_waitlist_position_uniq'
+            ),
+        ]
+        indexes = [
+            # Keyset pagination walks (-booking_date, id)
+            models.Index(fields=['-booking_date', 'id'], name='booking_date_id_idx'),
+            # ?event=&status= and per-event status breakdowns
+            models.Index(fields=['event', 'status'], name='booking_event_status_idx'),
+            # ?status= ordered by booking_date
+            models.Index(fields=['status', '-booking_date'], name='booking_status_date_idx'),
+            # Confirmed seats per event, the hottest capacity lookup
+            models.Index(
+                fields=['event'],
+                condition=Q(status='confirmed'),
+                name='booking_confirmed_event_idx',
+            ),
+            # The hold sweeper walks pending bookings by expiry
+            models.Index(
+                fields=['hold_expires_at'],
+                condition=Q(status='pending'),
+                name='booking_hold_expiry_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.attendee.full_name} - {self.event.title} ({self.status})"
 
-    def clean(self):
-        # Check if event has capacity
-        if self.status == 'confirmed' and self.event.is_fully_booked:
-            # Check if this is an update (not a new booking)
-            if not self.pk or self.status != Booking.objects.get(pk=self.pk).status:
-                raise ValidationError("Event is fully booked")
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what is stored so save() can tell which seat moves to make
+        instance._stored_event_id = instance.__dict__.get('event_id')
+        instance._stored_status = instance.__dict__.get('status')
+        return instance
 
     def save(self, *args, **kwargs):
-        self.full_clean()
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            if self.status != 'waitlisted':
+                self.waitlist_position = None
+            elif self.waitlist_position is None or self.event_id != getattr(self, '_stored_event_id', self.event_id):
+                # Joining a waitlist, or moving to another event's, goes to the back of the line
+                self.waitlist_position = Booking.objects.next_waitlist_position(self.event_id)
+            # Capacity is enforced by the conditional counter update below rather
+            # than in clean(), so it cannot be raced by a concurrent booking.
+            self.full_clean()
+            if self.status == 'pending' and getattr(self, '_stored_status', None) != 'pending':
+                self.hold_expires_at = timezone.now() + timedelta(seconds=settings.BOOKING_HOLD_SECONDS)
+            elif self.status not in ('pending', 'expired'):
+                self.hold_expires_at = None
+            self._sync_seat_counters()
+            super().save(*args, **kwargs)
+        self._stored_event_id = self.event_id
+        self._stored_status = self.status
+
+    def _sync_seat_counters(self):
+        """Move the event seat counters to match this booking's new state."""
+        stored = self.SEAT_COUNTERS.get(getattr(self, '_stored_status', None))
+        current = self.SEAT_COUNTERS.get(self.status)
+        stored_event_id = getattr(self, '_stored_event_id', None)
+        if stored == current and stored_event_id == self.event_id:
+            return
+
+        if stored == 'held_count' and current == 'confirmed_count' and stored_event_id == self.event_id:
+            # Confirming a hold keeps the seat it already reserved
+            if Event.objects.convert_held(self.event_id):
+                self._adjust_cached_event(self.event_id, -1, 'held_count')
+                self._adjust_cached_event(self.event_id, 1)
+                return
+
+        if stored == 'confirmed_count':
+            Event.objects.decrement_confirmed(stored_event_id)
+            self._adjust_cached_event(stored_event_id, -1)
+        elif stored == 'held_count':
+            Event.objects.release_held(stored_event_id)
+            self._adjust_cached_event(stored_event_id, -1, 'held_count')
+
+        if current == 'confirmed_count':
+            if not Event.objects.increment_confirmed(self.event_id):
+                raise SeatUnavailable("Event is fully booked")
+            self._adjust_cached_event(self.event_id, 1)
+        elif current == 'held_count':
+            if not Event.objects.hold_seats(self.event_id):
+                raise SeatUnavailable("This event is fully booked")
+            self._adjust_cached_event(self.event_id, 1, 'held_count')
+
+    def _adjust_cached_event(self, event_id, delta, counter='confirmed_count'):
+        # Keep an already loaded event in step with the row we just updated
+        if Booking.event.is_cached(self) and self.event.pk == event_id:
+            setattr(self.event, counter, getattr(self.event, counter) + delta)
+
+
+class IdempotencyKeyQuerySet(models.QuerySet):
+    def claim(self, user, key, fingerprint):
+        """
+        Reserve `key` for a new request, or return the record already holding it.
+
+        Returns `(record, claimed)`. An expired record is taken over as if it
+        did not exist.
+        """
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+        fresh = {'fingerprint': fingerprint, 'status_code': None, 'response': None, 'expires_at': expires_at}
+        record, claimed = self.get_or_create(user=user, key=key, defaults=fresh)
+        if not claimed and record.expires_at <= now:
+            claimed = bool(self.filter(pk=record.pk, expires_at__lte=now).update(**fresh))
+            record.refresh_from_db()
+        return record, claimed
+
+    def purge_expired(self, now=None):
+        """Delete expired keys; returns how many were removed."""
+        deleted, _ = self.filter(expires_at__lte=now or timezone.now()).delete()
+        return deleted
+
+
+class IdempotencyKey(models.Model):
+    """The response to a write sent with an `Idempotency-Key` header, kept for replay."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    # SHA-256 of the method, path and body the key was first used with
+    fingerprint = models.CharField(max_length=64)
+    # Both empty while the first request is still being handled
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    expires_at = models.DateTimeField(db_index=True)
+
+    objects = IdempotencyKeyQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_key_user_key_uniq'),
+        ]
+
+    def __str__(self):
+        return self.key
@@ -0,0 +1,5 @@
+from core.pagination import SelectablePagination
+
+
+class BookingPagination(SelectablePagination):
+    ordering = ('-booking_date', 'id')
@@ -0,0 +1,508 @@
+"""
+Seat reservation service.
+
+Every booking write that can change how many seats an event has left goes
+through this module. Seats are claimed with a single conditional UPDATE on
+``Event.confirmed_count`` (``... WHERE confirmed_count < capacity``), and
+booking status changes are applied as compare-and-set UPDATEs, locking the
+booking row with ``select_for_update`` on backends that support it. Two
+concurrent requests therefore can never both take the last seat.
+
+Pending bookings hold a seat (``Event.held_count``) until their
+``hold_expires_at``; ``expire_holds`` releases the holds that ran out.
+Bookings that opt in join a first-come, first-served waitlist when the
+event is full, and a seat freed by a cancellation or an expired hold goes
+straight to the head of that waitlist in the same transaction.
+"""
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from rest_framework import status
+
+from apps.attendees.models import Attendee
+from apps.events.models import Event, SeatUnavailable
+from .exceptions import BookingException
+from .models import Booking
+from .signals import bookings_changed
+
+logger = logging.getLogger(__name__)
+
+# How long (seconds) a write that keeps hitting a locked database is
+# retried before the request is refused with a 503
+LOCK_RETRY_TIMEOUT = 10.0
+LOCK_RETRY_DELAY = 0.005
+LOCK_RETRY_MAX_DELAY = 0.2
+
+
+class ReservationMetrics:
+    """Thread-safe counters describing how contended seat reservations are."""
+
+    OUTCOMES = ('reserved', 'released', 'expired', 'sold_out', 'conflict', 'lock_timeout')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = dict.fromkeys(self.OUTCOMES, 0)
+            self._attempts = 0
+            self._lock_retries = 0
+            self._total_seconds = 0.0
+            self._max_seconds = 0.0
+
+    def record(self, outcome, elapsed, lock_retries=0):
+        with self._lock:
+            self._counts[outcome] += 1
+            self._attempts += 1
+            self._lock_retries += lock_retries
+            self._total_seconds += elapsed
+            self._max_seconds = max(self._max_seconds, elapsed)
+
+    def snapshot(self):
+        with self._lock:
+            attempts = self._attempts
+            return {
+                'attempts': attempts,
+                **self._counts,
+                'lock_retries': self._lock_retries,
+                'avg_ms': (self._total_seconds / attempts * 1000) if attempts else 0.0,
+                'max_ms': self._max_seconds * 1000,
+            }
+
+
+metrics = ReservationMetrics()
+
+
+def _is_lock_error(exc):
+    return 'locked' in str(exc).lower()
+
+
+def _run(operation, outcome):
+    """
+    Run `operation` in its own transaction and record how it went.
+
+    Writes that collide on a locked database (SQLite's single writer) are
+    retried with a short backoff for up to LOCK_RETRY_TIMEOUT seconds; each
+    retry is reported as contention. After that the write is refused with
+    a 503 so the client can retry later.
+    """
+    started = time.perf_counter()
+    retries = 0
+    while True:
+        try:
+            with transaction.atomic():
+                result = operation()
+        except OperationalError as exc:
+            if not _is_lock_error(exc):
+                raise
+            elapsed = time.perf_counter() - started
+            if elapsed >= LOCK_RETRY_TIMEOUT:
+                metrics.record('lock_timeout', elapsed, retries)
+                raise BookingException(
+                    "Too many concurrent bookings, please retry",
+                    code=status.HTTP_503_SERVICE_UNAVAILABLE
+                ) from exc
+            retries += 1
+            # Exponential backoff with jitter so retrying writers spread out
+            delay = min(LOCK_RETRY_MAX_DELAY, LOCK_RETRY_DELAY * 2 ** retries)
+            time.sleep(random.uniform(0, delay))
+            continue
+        except SeatUnavailable as exc:
+            metrics.record('sold_out', time.perf_counter() - started, retries)
+            raise BookingException(exc.messages[0], code=status.HTTP_400_BAD_REQUEST)
+        except BookingException:
+            metrics.record('conflict', time.perf_counter() - started, retries)
+            raise
+        metrics.record(outcome, time.perf_counter() - started, retries)
+        if retries:
+            logger.debug("Seat reservation needed %d lock retries", retries)
+        return result
+
+
+def _transition(booking, to_status, from_statuses):
+    """
+    Move a booking to `to_status` if it is currently in one of `from_statuses`.
+
+    Returns the status the booking had before, or None when it was not in an
+    allowed state (i.e. another request got there first). Leaving the
+    waitlist or ending a hold clears the booking's place or expiry.
+    """
+    bookings = Booking.objects.filter(pk=booking.pk)
+    changes = {
+        'status': to_status,
+        'updated_at': timezone.now(),
+        'waitlist_position': None,
+        'hold_expires_at': None,
+    }
+
+    if connection.features.has_select_for_update:
+        current = bookings.select_for_update().values_list('status', flat=True).first()
+        if current not in from_statuses:
+            return None
+        bookings.update(**changes)
+        return current
+
+    # Without row locks, compare-and-set one candidate state at a time
+    for from_status in from_statuses:
+        if bookings.filter(status=from_status).update(**changes):
+            return from_status
+    return None
+
+
+def _promote_next(event_id):
+    """
+    Give a freed seat to the first waitlisted booking of the event.
+
+    Returns the id of the promoted booking, or None when nobody is waiting.
+    """
+    waiting = Booking.objects.filter(event_id=event_id, status='waitlisted').order_by('waitlist_position')
+    while True:
+        candidate = waiting.values_list('pk', flat=True).first()
+        if candidate is None:
+            return None
+        promoted = waiting.filter(pk=candidate).update(
+            status='confirmed', waitlist_position=None, updated_at=timezone.now()
+        )
+        if promoted:
+            return candidate
+        # It left the waitlist meanwhile; try the next in line
+
+
+def _hand_on_seat(event_id, counter):
+    """
+    Give back a seat from `counter` and pass it to the head of the waitlist.
+
+    The promoted booking claims its seat like any other confirmation, so the
+    counters stay right even when `counter` had already drifted to zero.
+    Returns the change made to each of the event's counters.
+    """
+    release = Event.objects.decrement_confirmed if counter == 'confirmed_count' else Event.objects.release_held
+    deltas = Counter()
+    if release(event_id):
+        deltas[counter] -= 1
+    deltas['confirmed_count'] += _fill_from_waitlist(event_id, 1)
+    return {name: delta for name, delta in deltas.items() if delta}
+
+
+def _fill_from_waitlist(event_id, seats):
+    """Promote up to `seats` waitlisted bookings into free seats; return how many."""
+    if not Booking.objects.filter(event_id=event_id, status='waitlisted').exists():
+        return 0
+    return _promote_up_to(event_id, seats)
+
+
+def _promote_up_to(event_id, seats):
+    for promoted in range(seats):
+        if not Event.objects.increment_confirmed(event_id):
+            return promoted
+        if _promote_next(event_id) is None:
+            Event.objects.decrement_confirmed(event_id)
+            return promoted
+    return seats
+
+
+def _apply(booking, new_status, event_deltas):
+    """Mirror a committed transition on the in-memory booking."""
+    booking.status = new_status
+    booking._stored_status = new_status
+    booking.waitlist_position = None
+    booking.hold_expires_at = None
+    booking.updated_at = timezone.now()
+    for counter, delta in event_deltas.items():
+        booking._adjust_cached_event(booking.event_id, delta, counter)
+
+
+def create_booking(join_waitlist=False, **data):
+    """
+    Create a booking on an event that still has seats left.
+
+    A confirmed booking claims its seat and a pending one holds a seat, in
+    the same transaction (see ``Booking.save``). When the event is full the
+    booking joins the end of its waitlist if `join_waitlist` is set, and is
+    refused otherwise.
+    """
+    def operation():
+        booking = Booking(**data)
+        try:
+            with transaction.atomic():
+                booking.save()
+        except SeatUnavailable:
+            if not join_waitlist:
+                raise
+            booking.status = 'waitlisted'
+            booking.save()
+        return booking
+
+    return _run(operation, 'reserved')
+
+
+def confirm_booking(booking):
+    """
+    Confirm a booking. A pending booking keeps the seat it holds; a
+    cancelled or expired one needs the event to still have a seat.
+    """
+    def operation():
+        previous = _transition(booking, 'confirmed', ('pending', 'cancelled', 'expired'))
+        if previous is None:
+            if booking.status == 'waitlisted':
+                raise BookingException("Waitlisted bookings are confirmed when a seat frees up")
+            raise BookingException("Booking is already confirmed")
+        if previous == 'pending' and Event.objects.convert_held(booking.event_id):
+            return {'held_count': -1, 'confirmed_count': 1}
+        if not Event.objects.increment_confirmed(booking.event_id):
+            raise SeatUnavailable("Event is fully booked")
+        return {'confirmed_count': 1}
+
+    event_deltas = _run(operation, 'reserved')
+    _apply(booking, 'confirmed', event_deltas)
+    bookings_changed.send(sender=Booking, event_ids={booking.event_id})
+    return booking
+
+
+def cancel_booking(booking):
+    """
+    Cancel a booking. The seat a confirmed or pending booking had goes to
+    the head of the waitlist, or back to the event when nobody is waiting.
+    """
+    def operation():
+        previous = _transition(booking, 'cancelled', ('confirmed', 'pending', 'waitlisted'))
+        if previous is None:
+            raise BookingException("Booking is already cancelled")
+        counter = Booking.SEAT_COUNTERS.get(previous)
+        return _hand_on_seat(booking.event_id, counter) if counter else {}
+
+    event_deltas = _run(operation, 'released')
+    _apply(booking, 'cancelled', event_deltas)
+    bookings_changed.send(sender=Booking, event_ids={booking.event_id})
+    return booking
+
+
+def update_booking(booking, **changes):
+    """
+    Apply an edit (PUT/PATCH) to a booking.
+
+    ``Booking.save`` moves the seats in the same transaction, so a status or
+    event change the event has no seat for is refused like a new booking.
+    A booking changed by another request since it was loaded is refused
+    with a 409 rather than having its seat moved twice. A seat the edit
+    frees goes to the head of the waitlist, as on cancel.
+    """
+    stored_status = booking._stored_status
+    stored_event_id = booking._stored_event_id
+    seated = Booking.SEAT_COUNTERS.get(changes.get('status', stored_status))
+    if stored_status == 'waitlisted' and seated:
+        raise BookingException("Waitlisted bookings are confirmed when a seat frees up")
+
+    def operation():
+        current = Booking.objects.filter(pk=booking.pk)
+        if connection.features.has_select_for_update:
+            current = current.select_for_update()
+        if current.values_list('status', flat=True).first() != stored_status:
+            raise BookingException(
+                "This booking was changed by another request, please retry",
+                code=status.HTTP_409_CONFLICT
+            )
+        for name, value in changes.items():
+            setattr(booking, name, value)
+        booking.save()
+        left_seat = not seated or booking.event_id != stored_event_id
+        if Booking.SEAT_COUNTERS.get(stored_status) and left_seat:
+            promoted = _fill_from_waitlist(stored_event_id, 1)
+            booking._adjust_cached_event(stored_event_id, promoted)
+        return booking
+
+    return _run(operation, 'reserved' if seated else 'released')
+
+
+def _claim_up_to(event_id, wanted, counter='confirmed_count'):
+    """Claim as many of `wanted` seats as the event has left; return how many."""
+    claim = Event.objects.increment_confirmed if counter == 'confirmed_count' else Event.objects.hold_seats
+    while wanted > 0:
+        if claim(event_id, wanted):
+            return wanted
+        remaining = (
+            Event.objects.filter(pk=event_id)
+            .values_list(F('capacity') - F('confirmed_count') - F('held_count'), flat=True)
+            .first()
+        )
+        wanted = min(wanted, remaining or 0)
+    return 0
+
+
+def create_bookings(items, all_or_nothing=False):
+    """
+    Create many bookings with set-based checks and a single bulk INSERT.
+
+    `items` are dicts with `event` and `attendee` ids and a `status`. Events,
+    attendees and existing bookings are each loaded in one query, seats are
+    claimed (confirmed) or held (pending) with one conditional UPDATE per
+    event, and the rows are written with `bulk_create`. Returns one `(booking, error)` pair per
+    item, in order. With `all_or_nothing`, any error means nothing is written.
+    """
+    def operation():
+        errors = [None] * len(items)
+        event_ids = {item['event'] for item in items}
+        attendee_ids = {item['attendee'] for item in items}
+
+        events = Event.objects.only('is_active').in_bulk(event_ids)
+        attendees = set(
+            Attendee.objects.filter(pk__in=attendee_ids).values_list('pk', flat=True)
+        )
+        taken = set(
+            Booking.objects.filter(event_id__in=event_ids, attendee_id__in=attendee_ids)
+            .values_list('event_id', 'attendee_id')
+        )
+
+        for index, item in enumerate(items):
+            pair = (item['event'], item['attendee'])
+            if item['event'] not in events:
+                errors[index] = "Event does not exist"
+            elif item['attendee'] not in attendees:
+                errors[index] = "Attendee does not exist"
+            elif not events[item['event']].is_active:
+                errors[index] = "Cannot book an inactive event"
+            elif pair in taken:
+                errors[index] = "Attendee has already booked this event"
+            else:
+                taken.add(pair)
+
+        # Claim or hold seats per event, first come first served in the payload
+        wanted = {}
+        for index, item in enumerate(items):
+            if errors[index] is None:
+                counter = Booking.SEAT_COUNTERS[item['status']]
+                wanted.setdefault((item['event'], counter), []).append(index)
+        for (event_id, counter), indexes in wanted.items():
+            granted = _claim_up_to(event_id, len(indexes), counter)
+            for index in indexes[granted:]:
+                errors[index] = "This event is fully booked"
+
+        if all_or_nothing and any(errors):
+            transaction.set_rollback(True)
+            return [
+                (None, error or "Not created because another booking in the request failed")
+                for error in errors
+            ]
+
+        hold_expires_at = timezone.now() + timedelta(seconds=settings.BOOKING_HOLD_SECONDS)
+        bookings = Booking.objects.bulk_create([
+            Booking(
+                event_id=item['event'],
+                attendee_id=item['attendee'],
+                status=item['status'],
+                hold_expires_at=hold_expires_at if item['status'] == 'pending' else None,
+            )
+            for index, item in enumerate(items) if errors[index] is None
+        ])
+        created = iter(bookings)
+        return [(None, error) if error else (next(created), None) for error in errors]
+
+    try:
+        results = _run(operation, 'reserved')
+    except IntegrityError:
+        raise BookingException(
+            "Some of these bookings were created by a concurrent request, please retry",
+            code=status.HTTP_409_CONFLICT
+        )
+
+    event_ids = {booking.event_id for booking, _ in results if booking is not None}
+    if event_ids:
+        bookings_changed.send(sender=Booking, event_ids=event_ids)
+    return results
+
+
+def expire_holds(batch_size=500, now=None):
+    """
+    Release the seats of pending bookings whose hold has run out.
+
+    Works in batches: each selects up to `batch_size` expired holds along the
+    expiry index, marks them expired with one UPDATE and takes their seats
+    off `held_count` with one more, then offers the freed seats to the
+    waitlist. Only the holds that UPDATE actually expired give back a seat;
+    one confirmed or cancelled meanwhile has released its own. Returns how
+    many holds expired.
+    """
+    now = now or timezone.now()
+
+    def operation():
+        due = Booking.objects.filter(status='pending', hold_expires_at__lte=now).order_by('hold_expires_at')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        rows = list(due.values_list('pk', 'event_id')[:batch_size])
+        pks = [pk for pk, _ in rows]
+        expired = Booking.objects.filter(pk__in=pks, status='pending').update(status='expired', updated_at=now)
+        if expired < len(rows):
+            # Some were confirmed or cancelled meanwhile and released their own seat
+            rows = Booking.objects.filter(pk__in=pks, status='expired', updated_at=now).values_list('pk', 'event_id')
+        seats = Counter(event_id for _, event_id in rows)
+        if not seats:
+            return seats, len(pks)
+        Event.objects.filter(pk__in=seats).update(
+            held_count=Greatest(
+                F('held_count') - Case(*(When(pk=event_id, then=Value(count)) for event_id, count in seats.items())),
+                Value(0),
+            ),
+            updated_at=now,
+        )
+        for event_id, count in seats.items():
+            _fill_from_waitlist(event_id, count)
+        return seats, len(pks)
+
+    expired = 0
+    while True:
+        seats, selected = _run(operation, 'expired')
+        if seats:
+            expired += sum(seats.values())
+            bookings_changed.send(sender=Booking, event_ids=set(seats))
+        if selected < batch_size:
+            return expired
+
+
+def release_seats(bookings):
+    """
+    Give back the seats of deleted bookings and offer them to the waitlists.
+
+    `bookings` are the `(event_id, status)` pairs of bookings that are gone.
+    The seats come off every event's counters with one UPDATE, and each
+    event with people waiting gets one promotion pass. Runs in the caller's
+    transaction. Returns the ids of the events that gave back seats.
+    """
+    seats = {counter: Counter() for counter in Booking.SEAT_COUNTERS.values()}
+    for event_id, booking_status in bookings:
+        counter = Booking.SEAT_COUNTERS.get(booking_status)
+        if counter:
+            seats[counter][event_id] += 1
+    freed = sum(seats.values(), Counter())
+    if not freed:
+        return set()
+
+    Event.objects.filter(pk__in=freed).update(
+        **{
+            counter: Greatest(
+                F(counter) - Case(
+                    *(When(pk=event_id, then=Value(count)) for event_id, count in per_event.items()),
+                    default=Value(0),
+                ),
+                Value(0),
+            )
+            for counter, per_event in seats.items() if per_event
+        },
+        updated_at=timezone.now(),
+    )
+    waiting = set(
+        Booking.objects.filter(event_id__in=freed, status='waitlisted')
+        .values_list('event_id', flat=True).distinct()
+    )
+    for event_id in waiting:
+        _promote_up_to(event_id, freed[event_id])
+    return set(freed)
@@ -1,20 +1,34 @@
 from rest_framework import serializers
+from rest_framework.validators import UniqueTogetherValidator
+from core.serializers import DynamicFieldsMixin
 from .models import Booking
 from apps.events.serializers import EventSerializer
 from apps.attendees.serializers import AttendeeSerializer
 
 
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     event_details = EventSerializer(source='event', read_only=True)
     attendee_details = AttendeeSerializer(source='attendee', read_only=True)
+    join_waitlist = serializers.BooleanField(write_only=True, required=False, default=False)
 
     class Meta:
         model = Booking
         fields = [
-            'id', 'event', 'attendee', 'status', 'booking_date',
-            'updated_at', 'event_details', 'attendee_details'
+            'id', 'event', 'attendee', 'status', 'waitlist_position', 'hold_expires_at', 'booking_date',
+            'updated_at', 'event_details', 'attendee_details', 'join_waitlist'
         ]
-        read_only_fields = ['booking_date', 'updated_at']
+        read_only_fields = ['waitlist_position', 'booking_date', 'updated_at']
+        # Booking.save places waitlisted bookings in line, so only (event, attendee) is checked here
+        validators = [UniqueTogetherValidator(queryset=Booking.objects.all(), fields=['event', 'attendee'])]
+        # Nested details are only rendered with ?expand=event,attendee
+        expandable_fields = {'event': 'event_details', 'attendee': 'attendee_details'}
+
+    def validate_status(self, value):
+        if value == 'waitlisted':
+            raise serializers.ValidationError("Use join_waitlist to join an event's waitlist")
+        if value == 'expired':
+            raise serializers.ValidationError("Only holds that run out are expired")
+        return value
 
     def validate(self, data):
         # Check if event is active
@@ -34,3 +48,15 @@ class BookingSerializer(serializers.ModelSerializer):
                 )
 
         return data
+
+
+class BulkBookingItemSerializer(serializers.Serializer):
+    event = serializers.IntegerField(min_value=1)
+    attendee = serializers.IntegerField(min_value=1)
+    status = serializers.ChoiceField(choices=['pending', 'confirmed'], default='pending')
+
+
+class BulkBookingSerializer(serializers.Serializer):
+    """Payload of POST /api/bookings/bulk/."""
+    bookings = BulkBookingItemSerializer(many=True, allow_empty=False, max_length=500)
+    all_or_nothing = serializers.BooleanField(default=False)
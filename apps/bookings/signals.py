@@ -0,0 +1,58 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from apps.attendees.models import Attendee
+from .models import Booking
+
+# Sent whenever bookings of the given events were written, including the
+# queryset-level updates of the reservation service. Args: event_ids.
+bookings_changed = Signal()
+
+
+@receiver(post_save, sender=Booking)
+def booking_saved(sender, instance, **kwargs):
+    event_ids = {instance.event_id, getattr(instance, '_stored_event_id', None)}
+    bookings_changed.send(sender=Booking, event_ids=event_ids - {None})
+
+
+def _cascaded(origin):
+    """Return True when the deletion started from something other than bookings."""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return origin is not None and model is not Booking
+
+
+@receiver(post_delete, sender=Booking)
+def release_seat(sender, instance, origin=None, **kwargs):
+    """
+    Pass the seat of a deleted confirmed or pending booking to the head of
+    the waitlist, or give it back. Runs in the deleting transaction.
+
+    Bookings deleted along with their attendee are released together by
+    `release_attendee_seats`; those deleted with their event take their
+    seats with them.
+    """
+    if _cascaded(origin):
+        return
+    from .reservations import release_seats  # the service imports this module
+
+    status = getattr(instance, '_stored_status', instance.status)
+    event_id = getattr(instance, '_stored_event_id', instance.event_id)
+    release_seats([(event_id, status)])
+    bookings_changed.send(sender=Booking, event_ids={event_id, instance.event_id})
+
+
+@receiver(pre_delete, sender=Attendee)
+def collect_attendee_seats(sender, instance, **kwargs):
+    instance._deleted_bookings = list(Booking.objects.filter(attendee=instance).values_list('event_id', 'status'))
+
+
+@receiver(post_delete, sender=Attendee)
+def release_attendee_seats(sender, instance, **kwargs):
+    """Release the seats of a deleted attendee's bookings in one go."""
+    from .reservations import release_seats  # the service imports this module
+
+    bookings = getattr(instance, '_deleted_bookings', [])
+    release_seats(bookings)
+    if bookings:
+        bookings_changed.send(sender=Booking, event_ids={event_id for event_id, _ in bookings})
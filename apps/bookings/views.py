@@ -2,36 +2,34 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.shortcuts import get_object_or_404
+from core.mixins import ConditionalGetMixin, SparseFieldsetMixin
+from core.serializers import restrict_queryset
+from .idempotency import IdempotencyMixin
 from .models import Booking
-from .serializers import BookingSerializer
-from .exceptions import BookingException
+from .pagination import BookingPagination
+from .serializers import BookingSerializer, BulkBookingSerializer
+from . import reservations
 
 
-class BookingViewSet(viewsets.ModelViewSet):
+class BookingViewSet(IdempotencyMixin, ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing bookings.
     """
-    queryset = Booking.objects.select_related('event', 'attendee')
+    queryset = Booking.objects.with_details()
     serializer_class = BookingSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = BookingPagination
+    expanded_last_modified = {'event': 'event__updated_at', 'attendee': 'attendee__updated_at'}
     filterset_fields = ['event', 'attendee', 'status']
+    idempotent_actions = ('create', 'confirm', 'cancel')
+    query_budgets = {'list': 5, 'retrieve': 4, 'create': 15, 'confirm': 6, 'cancel': 10, 'bulk': 8}
 
     def create(self, request, *args, **kwargs):
-        """Custom create method to handle booking validation."""
+        """Custom create method that claims the seat through the reservation service."""
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        event = serializer.validated_data['event']
-
-        # Check if event is fully booked
-        if event.is_fully_booked:
-            raise BookingException(
-                "This event is fully booked",
-                code=status.HTTP_400_BAD_REQUEST
-            )
-
-        self.perform_create(serializer)
+        serializer.instance = reservations.create_booking(**serializer.validated_data)
         headers = self.get_success_headers(serializer.data)
         return Response(
             serializer.data,
@@ -39,25 +37,16 @@ class BookingViewSet(viewsets.ModelViewSet):
             headers=headers
         )
 
+    def perform_update(self, serializer):
+        """Apply edits through the reservation service, which moves the seats."""
+        changes = dict(serializer.validated_data)
+        changes.pop('join_waitlist', None)
+        serializer.instance = reservations.update_booking(serializer.instance, **changes)
+
     @action(detail=True, methods=['post'])
     def confirm(self, request, pk=None):
         """Confirm a booking."""
-        booking = self.get_object()
-
-        if booking.status == 'confirmed':
-            return Response(
-                {"detail": "Booking is already confirmed"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        if booking.event.is_fully_booked:
-            return Response(
-                {"detail": "Event is fully booked"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        booking.status = 'confirmed'
-        booking.save()
+        booking = reservations.confirm_booking(self.get_object())
 
         serializer = self.get_serializer(booking)
         return Response(serializer.data)
@@ -65,16 +54,49 @@ class BookingViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
         """Cancel a booking."""
-        booking = self.get_object()
-
-        if booking.status == 'cancelled':
-            return Response(
-                {"detail": "Booking is already cancelled"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        booking.status = 'cancelled'
-        booking.save()
+        booking = reservations.cancel_booking(self.get_object())
 
         serializer = self.get_serializer(booking)
         return Response(serializer.data)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Create many bookings in one request.
+
+        Returns a result per item. With `all_or_nothing`, nothing is created
+        unless every item can be.
+        """
+        payload = BulkBookingSerializer(data=request.data)
+        payload.is_valid(raise_exception=True)
+
+        results = reservations.create_bookings(
+            payload.validated_data['bookings'],
+            all_or_nothing=payload.validated_data['all_or_nothing'],
+        )
+
+        # Read the created rows back in one query, joined for ?expand=
+        serializer = self.get_serializer()
+        created_ids = [booking.pk for booking, _ in results if booking is not None]
+        fetched = restrict_queryset(Booking.objects.with_details(), serializer).in_bulk(created_ids)
+
+        context = self.get_serializer_context()
+        items = []
+        for index, (booking, error) in enumerate(results):
+            if booking is not None:
+                data = BookingSerializer(fetched[booking.pk], context=context).data
+                items.append({'index': index, 'created': True, 'booking': data})
+            else:
+                items.append({'index': index, 'created': False, 'error': error})
+
+        created = sum(1 for item in items if item['created'])
+        if created == len(items):
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(
+            {'created': created, 'failed': len(items) - created, 'results': items},
+            status=response_status
+        )
@@ -4,3 +4,21 @@ from django.apps import AppConfig
 class EventsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.events"
+
+    def ready(self):
+        from django.core.signals import request_started
+
+        from . import signals  # noqa: F401
+
+        # Warm the country registry before the first request is handled
+        # rather than here, since the database may not be ready yet.
+        request_started.connect(warm_country_registry, dispatch_uid='warm_country_registry')
+
+
+def warm_country_registry(**kwargs):
+    from django.core.signals import request_started
+
+    from .registry import countries
+
+    request_started.disconnect(dispatch_uid='warm_country_registry')
+    countries.warm()
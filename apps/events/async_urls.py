@@ -0,0 +1,11 @@
+from django.urls import path
+
+from . import async_views
+
+urlpatterns = [
+    path('events/', async_views.event_list, name='async-event-list'),
+    path('events/available/', async_views.available_events, name='async-event-available'),
+    path('events/stream/', async_views.seat_stream, name='async-event-stream'),
+    path('events/<int:pk>/', async_views.event_detail, name='async-event-detail'),
+    path('events/<int:pk>/capacity/', async_views.event_capacity, name='async-event-capacity'),
+]
@@ -0,0 +1,183 @@
+"""
+Async read endpoints for events.
+
+Served by the ASGI app (core/asgi.py), these read rows with the async ORM,
+so a worker is not held while a request waits on the database or a slow
+client. They render the same JSON as the EventViewSet read actions and
+honour its filters, search, ordering, `?fields=` and `?expand=`. They are
+read-only, need no authentication and are paged by page number.
+"""
+import asyncio
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseBase, StreamingHttpResponse
+from rest_framework.exceptions import APIException, MethodNotAllowed, NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from . import streams
+from .models import Event
+from .registry import countries
+from .serializers import EventSerializer
+from .views import EventViewSet, parse_event_ids
+
+MAX_STREAM_IDS = 100
+
+
+def _json(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), content_type='application/json', status=status)
+
+
+def read_only_endpoint(view):
+    """Hand the view a DRF Request and turn API exceptions into JSON errors."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            if request.method != 'GET':
+                raise MethodNotAllowed(request.method)
+            result = await view(Request(request), *args, **kwargs)
+            return result if isinstance(result, HttpResponseBase) else _json(result)
+        except APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+            return _json(detail, exc.status_code)
+    return wrapper
+
+
+def _filtered_queryset(request, action):
+    """EventViewSet's queryset for `action`, filtered by the request's query."""
+    view = EventViewSet(request=request, action=action, format_kwarg=None, args=(), kwargs={})
+    return view.filter_queryset(view.get_queryset())
+
+
+async def _events_queryset(request, action):
+    # Filter validation may look up related rows, so build it in a thread
+    return await sync_to_async(_filtered_queryset)(request, action)
+
+
+async def _serialize(request, events, many=False):
+    serializer = EventSerializer(events, many=many, context={'request': request, 'view': None})
+    rows = events if many else [events]
+    location_ids = {event.location_id for event in rows}
+    # Make sure the registry holds every location before rendering offline
+    await sync_to_async(lambda: [countries.get(pk) for pk in location_ids])()
+    return serializer.data
+
+
+async def _paginated(request, queryset):
+    page_size = api_settings.PAGE_SIZE
+    try:
+        page = int(request.query_params.get('page', 1))
+        if page < 1:
+            raise ValueError
+    except ValueError:
+        raise NotFound("Invalid page.")
+
+    count = await queryset.acount()
+    offset = (page - 1) * page_size
+    if offset and offset >= count:
+        raise NotFound("Invalid page.")
+    events = [event async for event in queryset[offset:offset + page_size].aiterator()]
+
+    url = request.build_absolute_uri()
+    next_url = replace_query_param(url, 'page', page + 1) if offset + page_size < count else None
+    if page == 1:
+        previous_url = None
+    elif page == 2:
+        previous_url = remove_query_param(url, 'page')
+    else:
+        previous_url = replace_query_param(url, 'page', page - 1)
+
+    return {
+        'count': count,
+        'next': next_url,
+        'previous': previous_url,
+        'results': await _serialize(request, events, many=True),
+    }
+
+
+@read_only_endpoint
+async def event_list(request):
+    return await _paginated(request, await _events_queryset(request, 'list'))
+
+
+@read_only_endpoint
+async def available_events(request):
+    queryset = await _events_queryset(request, 'available')
+    return await _paginated(request, queryset.filter(is_active=True, remaining__gt=0))
+
+
+@read_only_endpoint
+async def event_detail(request, pk):
+    queryset = await _events_queryset(request, 'retrieve')
+    try:
+        event = await queryset.aget(pk=pk)
+    except Event.DoesNotExist:
+        raise NotFound("No Event matches the given query.")
+    return await _serialize(request, event)
+
+
+@read_only_endpoint
+async def event_capacity(request, pk):
+    """Seat counts for one event, read from the stored counter."""
+    row = await (
+        Event.objects.filter(pk=pk).values('id', 'capacity', 'confirmed_count', 'held_count').afirst()
+    )
+    if row is None:
+        raise NotFound("No Event matches the given query.")
+    remaining = row['capacity'] - row['confirmed_count'] - row['held_count']
+    return {
+        'id': row['id'],
+        'capacity': row['capacity'],
+        'confirmed_bookings': row['confirmed_count'],
+        'held_seats': row['held_count'],
+        'remaining_capacity': remaining,
+        'is_fully_booked': remaining <= 0,
+    }
+
+
+def _sse(message):
+    return f"event: seats\ndata: {json.dumps(message, separators=(',', ':'))}\n\n"
+
+
+@read_only_endpoint
+async def seat_stream(request):
+    """
+    Server-Sent Events stream of seat counts for `?ids=1,2,3`.
+
+    Starts with the current counts, then sends a `seats` event whenever a
+    booking of one of the events changes them.
+    """
+    ids = parse_event_ids(request.query_params.get('ids', ''), MAX_STREAM_IDS)
+    broker = streams.get_broker()
+
+    async def stream():
+        # Subscribe before reading the snapshot so no change falls in between
+        subscription = broker.subscribe(ids)
+        try:
+            await subscription.prime()
+            yield 'retry: 3000\n\n'
+            rows = Event.objects.filter(pk__in=ids).values('id', 'capacity', 'confirmed_count', 'held_count')
+            async for row in rows.aiterator():
+                yield _sse(streams.seat_message(
+                    row['id'], row['capacity'], row['confirmed_count'], row['held_count']
+                ))
+            while True:
+                try:
+                    messages = await asyncio.wait_for(subscription.get(), settings.SEAT_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                for message in messages:
+                    yield _sse(message)
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
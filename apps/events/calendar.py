@@ -0,0 +1,93 @@
+"""
+Process-local interval index of upcoming events.
+
+`GET /api/events/events/calendar/` answers "what is on between these two
+times (in these countries)" from memory. Each process keeps the active
+events that had not ended when it loaded them, sorted by start time.
+Because no event lasts longer than the longest one loaded, the events
+overlapping a window can only start between `window_start - max_duration`
+and `window_end`. Two bisections find that slice, and only the events in it
+are checked.
+
+The index is rebuilt after an Event is saved or deleted in this process and
+after EVENT_CALENDAR_TTL seconds, so other processes' changes show up too.
+Windows starting before the last load are answered from the database.
+"""
+import bisect
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Event
+
+FIELDS = ('id', 'title', 'start_datetime', 'end_datetime', 'location_id')
+
+Entry = namedtuple('Entry', FIELDS)
+
+
+def _upcoming_rows(since):
+    return Event.objects.filter(is_active=True, end_datetime__gte=since).order_by('start_datetime', 'id')
+
+
+class EventCalendar:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._loaded_at = 0.0
+
+    def _expired(self):
+        ttl = getattr(settings, 'EVENT_CALENDAR_TTL', 60)
+        return self._index is None or time.monotonic() - self._loaded_at > ttl
+
+    def reload(self):
+        since = timezone.now()
+        entries = [Entry(*row) for row in _upcoming_rows(since).values_list(*FIELDS)]
+        starts = [entry.start_datetime for entry in entries]
+        longest = max((entry.end_datetime - entry.start_datetime for entry in entries), default=timedelta(0))
+        index = (since, entries, starts, longest)
+        with self._lock:
+            self._index = index
+            self._loaded_at = time.monotonic()
+        return index
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+
+    def _table(self):
+        # Read once: a concurrent invalidate() may reset the attribute meanwhile
+        index = self._index
+        if index is None or self._expired():
+            index = self.reload()
+        return index
+
+    def between(self, start, end, location_ids=None):
+        """
+        The events running at some point between `start` and `end`, as
+        Entry tuples ordered by start time.
+
+        Queries the database when the index cannot answer (it is disabled,
+        or `start` is before the index was loaded).
+        """
+        if getattr(settings, 'EVENT_CALENDAR_ENABLED', True):
+            since, entries, starts, longest = self._table()
+            if start >= since:
+                lo = bisect.bisect_left(starts, start - longest)
+                hi = bisect.bisect_right(starts, end)
+                return [
+                    entry for entry in entries[lo:hi]
+                    if entry.end_datetime >= start
+                    and (not location_ids or entry.location_id in location_ids)
+                ]
+
+        rows = _upcoming_rows(start).filter(start_datetime__lte=end)
+        if location_ids:
+            rows = rows.filter(location_id__in=location_ids)
+        return [Entry(*row) for row in rows.values_list(*FIELDS)]
+
+
+calendar = EventCalendar()
@@ -0,0 +1,49 @@
+from django_filters import rest_framework as filters
+from rest_framework.exceptions import ValidationError
+
+from .models import Event
+from .registry import countries
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
+
+
+class CharInFilter(filters.BaseInFilter, filters.CharFilter):
+    pass
+
+
+class EventFilter(filters.FilterSet):
+    """
+    Exact and range filters for EventViewSet.
+
+    `?location=1,2` and `?country=US,FR` accept several countries; country
+    codes are resolved through the country registry, so neither joins the
+    countries table. Range filters use the `__gte` / `__lte` suffixes, e.g.
+    `?start_datetime__gte=...&price__lte=20&remaining_capacity__gte=2`.
+    """
+    location = NumberInFilter(method='filter_location')
+    country = CharInFilter(method='filter_country')
+    remaining_capacity__gte = filters.NumberFilter(field_name='remaining', lookup_expr='gte')
+    remaining_capacity__lte = filters.NumberFilter(field_name='remaining', lookup_expr='lte')
+
+    class Meta:
+        model = Event
+        fields = {
+            'is_active': ['exact'],
+            'start_datetime': ['exact', 'gte', 'lte'],
+            'end_datetime': ['gte', 'lte'],
+            'price': ['gte', 'lte'],
+        }
+
+    def filter_location(self, queryset, name, value):
+        unknown = [pk for pk in value if countries.get(pk) is None]
+        if unknown:
+            raise ValidationError({name: f"Unknown country id(s): {', '.join(map(str, unknown))}."})
+        return queryset.filter(location_id__in=value)
+
+    def filter_country(self, queryset, name, value):
+        ids = countries.ids_for_codes(value)
+        if not ids:
+            raise ValidationError({name: "No country matches these codes."})
+        return queryset.filter(location_id__in=ids)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.attendees.views import AttendeeViewSet
+from apps.events.views import EventViewSet
+from core.search import FullTextIndex
+
+SEARCHABLE = [EventViewSet, AttendeeViewSet]
+
+
+class Command(BaseCommand):
+    help = (
+        "Recreate the full-text search indexes of events and attendees and refill them. "
+        "Needed on SQLite after a migration rebuilds one of their tables."
+    )
+
+    def handle(self, *args, **options):
+        for view in SEARCHABLE:
+            index = FullTextIndex.for_model(view.queryset.model, view.search_fields)
+            with transaction.atomic():
+                index.install()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {index.name}."))
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.bookings.models import Booking
+from apps.events.models import Event
+
+
+class Command(BaseCommand):
+    help = "Recount confirmed and pending bookings and repair drifted Event seat counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Only report drifted events, do not write anything.",
+        )
+
+    def handle(self, *args, **options):
+        drifted = (
+            Event.objects
+            .annotate(
+                actual_confirmed=Count('bookings', filter=Q(bookings__status='confirmed')),
+                actual_held=Count('bookings', filter=Q(bookings__status='pending')),
+            )
+            .exclude(confirmed_count=F('actual_confirmed'), held_count=F('actual_held'))
+            .values_list('pk', 'confirmed_count', 'actual_confirmed', 'held_count', 'actual_held')
+        )
+
+        drifted_ids = []
+        for event_id, confirmed, actual_confirmed, held, actual_held in drifted:
+            drifted_ids.append(event_id)
+            self.stdout.write(
+                f"Event {event_id}: confirmed stored {confirmed}, actual {actual_confirmed}; "
+                f"held stored {held}, actual {actual_held}"
+            )
+
+        if not drifted_ids:
+            self.stdout.write(self.style.SUCCESS("All seat counters are in sync."))
+            return
+
+        if options['dry_run']:
+            self.stdout.write(f"{len(drifted_ids)} event(s) drifted, nothing changed (dry run).")
+            return
+
+        # Recount inside the UPDATE itself so concurrent bookings are not lost
+        def count(status):
+            return Coalesce(Subquery(
+                Booking.objects.filter(event=OuterRef('pk'), status=status)
+                .order_by()
+                .values('event')
+                .annotate(total=Count('pk'))
+                .values('total')
+            ), 0)
+
+        fixed = Event.objects.filter(pk__in=drifted_ids).update(
+            confirmed_count=count('confirmed'),
+            held_count=count('pending'),
+            updated_at=timezone.now()
+        )
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {fixed} event(s)."))
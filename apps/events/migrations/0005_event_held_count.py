@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0004_access_path_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="held_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
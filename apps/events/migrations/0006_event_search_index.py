@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from core.search import FullTextIndex
+
+INDEX = FullTextIndex('events_event', ['title', 'description'])
+
+
+def install(apps, schema_editor):
+    INDEX.install(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    INDEX.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0005_event_held_count"),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
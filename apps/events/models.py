@@ -1,5 +1,7 @@
 from django.db import models
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
+from django.db.models import F
 from django.utils import timezone
 
 
@@ -16,6 +18,92 @@ class Country(models.Model):
         return self.name
 
 
+class SeatUnavailable(ValidationError):
+    """Raised when a booking needs a seat on an event that has none left."""
+
+
+class EventQuerySet(models.QuerySet):
+    def with_capacity(self):
+        """
+        Annotate `confirmed_bookings` and `remaining` seats on every event.
+
+        Both come from the stored counters, so they can be filtered and
+        ordered on in SQL without joining or counting bookings. Seats held
+        by pending bookings are not remaining.
+        """
+        return self.annotate(
+            confirmed_bookings=F('confirmed_count'),
+            remaining=F('capacity') - F('confirmed_count') - F('held_count'),
+        )
+
+
+class EventManager(models.Manager.from_queryset(EventQuerySet)):
+    """
+    Manager with atomic helpers for the denormalized seat counters.
+
+    `confirmed_count` counts confirmed bookings and `held_count` pending
+    bookings whose hold has not expired; together they may never exceed
+    `capacity`.
+    """
+
+    def _with_free_seats(self, event_id, seats):
+        return self.filter(
+            pk=event_id,
+            confirmed_count__lte=F('capacity') - F('held_count') - seats,
+        )
+
+    def has_seats(self, event_id):
+        """Check the stored counters (not an in-memory copy) for a free seat."""
+        return self._with_free_seats(event_id, 1).exists()
+
+    def increment_confirmed(self, event_id, seats=1):
+        """
+        Take `seats` confirmed seats on an event if they are still available.
+
+        Runs a single conditional UPDATE so two concurrent writers can never
+        push the counters past capacity. Returns True when the seats were taken.
+        """
+        updated = self._with_free_seats(event_id, seats).update(
+            confirmed_count=F('confirmed_count') + seats, updated_at=timezone.now()
+        )
+        return updated == 1
+
+    def hold_seats(self, event_id, seats=1):
+        """Hold `seats` seats for pending bookings if they are still available."""
+        updated = self._with_free_seats(event_id, seats).update(
+            held_count=F('held_count') + seats, updated_at=timezone.now()
+        )
+        return updated == 1
+
+    def release_held(self, event_id, seats=1):
+        """Give back `seats` held seats, never dropping below zero."""
+        updated = self.filter(
+            pk=event_id,
+            held_count__gte=seats,
+        ).update(held_count=F('held_count') - seats, updated_at=timezone.now())
+        return updated == 1
+
+    def convert_held(self, event_id, seats=1):
+        """Turn `seats` held seats into confirmed ones; capacity is unchanged."""
+        updated = self.filter(
+            pk=event_id,
+            held_count__gte=seats,
+        ).update(
+            held_count=F('held_count') - seats,
+            confirmed_count=F('confirmed_count') + seats,
+            updated_at=timezone.now(),
+        )
+        return updated == 1
+
+    def decrement_confirmed(self, event_id, seats=1):
+        """Give back `seats` confirmed seats, never dropping below zero."""
+        updated = self.filter(
+            pk=event_id,
+            confirmed_count__gte=seats,
+        ).update(confirmed_count=F('confirmed_count') - seats, updated_at=timezone.now())
+        return updated == 1
+
+
 class Event(models.Model):
     """Model for events that can be booked by attendees."""
     title = models.CharField(max_length=200)
@@ -25,29 +113,56 @@ class Event(models.Model):
     location = models.ForeignKey(Country, on_delete=models.PROTECT, related_name='events')
     capacity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
     price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
+    # Number of confirmed bookings, maintained by Booking writes
+    confirmed_count = models.PositiveIntegerField(default=0, editable=False)
+    # Number of seats held by pending bookings, maintained the same way
+    held_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
     created_by = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='created_events')
 
+    objects = EventManager()
+
+    SEAT_COUNTERS = ('confirmed_count', 'held_count')
+
     class Meta:
         ordering = ['start_datetime']
+        indexes = [
+            # Keyset pagination walks (start_datetime, id)
+            models.Index(fields=['start_datetime', 'id'], name='event_start_id_idx'),
+            # ?is_active= and /available, both ordered by start_datetime
+            models.Index(fields=['is_active', 'start_datetime'], name='event_active_start_idx'),
+            # ?location= ordered by start_datetime
+            models.Index(fields=['location', 'start_datetime'], name='event_location_start_idx'),
+            # Upcoming active events (end_datetime >= now): the calendar
+            # index load and ?end_datetime__gte= windows
+            models.Index(fields=['is_active', 'end_datetime'], name='event_active_end_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.location.name}"
 
     def clean(self):
-        from django.core.exceptions import ValidationError
         if self.start_datetime and self.end_datetime:
             if self.start_datetime >= self.end_datetime:
                 raise ValidationError("Start datetime must be before end datetime")
             if self.start_datetime < timezone.now():
                 raise ValidationError("Event cannot start in the past")
 
+    def save(self, *args, **kwargs):
+        # The seat counters are only ever changed through conditional UPDATEs,
+        # so never write back possibly stale in-memory values.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.SEAT_COUNTERS
+            ]
+        super().save(*args, **kwargs)
+
     @property
     def remaining_capacity(self):
-        booked_count = self.bookings.filter(status='confirmed').count()
-        return self.capacity - booked_count
+        return self.capacity - self.confirmed_count - self.held_count
 
     @property
     def is_fully_booked(self):
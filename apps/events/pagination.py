@@ -0,0 +1,5 @@
+from core.pagination import SelectablePagination
+
+
+class EventPagination(SelectablePagination):
+    ordering = ('start_datetime', 'id')
@@ -11,5 +11,6 @@ class IsEventCreatorOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
 
-        # Write permissions are only allowed to the creator of the event
-        return obj.created_by == request.user
+        # Write permissions are only allowed to the creator of the event;
+        # compare ids so the creator is not fetched just for this check
+        return obj.created_by_id == request.user.pk
@@ -0,0 +1,75 @@
+"""
+Process-local lookup table of countries.
+
+Countries are few and almost never change, so each process keeps all of
+them in memory. The table is warmed on the first request, rebuilt by the
+Country signals whenever a country is saved or deleted in this process,
+and refreshed after COUNTRY_REGISTRY_TTL seconds so other processes pick
+up changes too. Reads and `location_id` validation then cost no queries.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from .models import Country
+
+
+class CountryRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._countries = None
+        self._loaded_at = 0.0
+
+    def _expired(self):
+        ttl = getattr(settings, 'COUNTRY_REGISTRY_TTL', 300)
+        return self._countries is None or time.monotonic() - self._loaded_at > ttl
+
+    def reload(self):
+        countries = {country.pk: country for country in Country.objects.all()}
+        with self._lock:
+            self._countries = countries
+            self._loaded_at = time.monotonic()
+        return countries
+
+    def warm(self):
+        """Load the table unless it is already loaded."""
+        if self._countries is None:
+            self.reload()
+
+    def invalidate(self):
+        with self._lock:
+            self._countries = None
+
+    def _table(self):
+        # Read once: a concurrent invalidate() may reset the attribute meanwhile
+        countries = self._countries
+        if countries is None or self._expired():
+            countries = self.reload()
+        return countries
+
+    def get(self, pk):
+        """Return the Country with `pk`, or None if there is no such country."""
+        table = self._table()
+        country = table.get(pk)
+        if country is None:
+            # Created by another process since our last load
+            country = Country.objects.filter(pk=pk).first()
+            if country is not None:
+                with self._lock:
+                    table[country.pk] = country
+        return country
+
+    def ids_for_codes(self, codes):
+        """The ids of the countries with any of `codes` (case-insensitive)."""
+        codes = {code.upper() for code in codes}
+        return [pk for pk, country in self._table().items() if country.code.upper() in codes]
+
+    def as_dict(self, pk):
+        country = self.get(pk)
+        if country is None:
+            return None
+        return {'id': country.pk, 'name': country.name, 'code': country.code}
+
+
+countries = CountryRegistry()
@@ -1,5 +1,9 @@
+from datetime import timedelta
+
 from rest_framework import serializers
+from core.serializers import DynamicFieldsMixin
 from .models import Event, Country
+from .registry import countries
 from django.utils import timezone
 
 
@@ -9,9 +13,22 @@ class CountrySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'code']
 
 
-class EventSerializer(serializers.ModelSerializer):
-    location = CountrySerializer(read_only=True)
-    location_id = serializers.PrimaryKeyRelatedField(
+class RegistryCountryField(serializers.PrimaryKeyRelatedField):
+    """Country primary key validated against the in-process registry."""
+
+    def to_internal_value(self, data):
+        try:
+            country = countries.get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if country is None:
+            self.fail('does_not_exist', pk_value=data)
+        return country
+
+
+class EventSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    location = serializers.SerializerMethodField()
+    location_id = RegistryCountryField(
         queryset=Country.objects.all(), source='location', write_only=True
     )
     remaining_capacity = serializers.ReadOnlyField()
@@ -27,6 +44,14 @@ class EventSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
+        source_fields = {
+            'location': ['location'],
+            'remaining_capacity': ['capacity', 'confirmed_count', 'held_count'],
+            'is_fully_booked': ['capacity', 'confirmed_count', 'held_count'],
+        }
+
+    def get_location(self, obj):
+        return countries.as_dict(obj.location_id)
 
     def validate(self, data):
         # Validate datetime fields
@@ -43,3 +68,43 @@ class EventSerializer(serializers.ModelSerializer):
             )
 
         return data
+
+
+class EventCalendarQuerySerializer(serializers.Serializer):
+    """Query parameters of the events calendar."""
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    location = serializers.CharField(required=False)
+
+    max_window = timedelta(days=92)
+
+    def validate_location(self, value):
+        try:
+            return {int(pk) for pk in value.split(',') if pk.strip()}
+        except ValueError:
+            raise serializers.ValidationError("Expected a comma-separated list of country ids.")
+
+    def validate(self, data):
+        if data['end'] < data['start']:
+            raise serializers.ValidationError("end must not be before start.")
+        if data['end'] - data['start'] > self.max_window:
+            raise serializers.ValidationError(f"The window may span at most {self.max_window.days} days.")
+        return data
+
+
+class EventCalendarEntrySerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    title = serializers.CharField()
+    start_datetime = serializers.DateTimeField()
+    end_datetime = serializers.DateTimeField()
+    location_id = serializers.IntegerField()
+
+
+class EventAvailabilitySerializer(serializers.ModelSerializer):
+    """Just the seat counters, for clients polling many events at once."""
+    remaining_capacity = serializers.ReadOnlyField()
+    is_fully_booked = serializers.ReadOnlyField()
+
+    class Meta:
+        model = Event
+        fields = ['id', 'remaining_capacity', 'is_fully_booked']
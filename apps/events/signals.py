@@ -0,0 +1,39 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from apps.bookings.signals import bookings_changed
+from core import cache
+from . import streams
+from .calendar import calendar
+from .models import Country, Event
+from .registry import countries
+
+
+@receiver([post_save, post_delete], sender=Country)
+def country_changed(sender, instance, **kwargs):
+    countries.reload()
+    transaction.on_commit(countries.reload)
+    if kwargs['signal'] is post_save and not kwargs['created']:
+        # Their embedded location changed, so their validators must too
+        Event.objects.filter(location=instance).update(updated_at=timezone.now())
+    # Events embed their location, so every cached event goes stale too
+    cache.bump('countries', 'events')
+
+
+@receiver([post_save, post_delete], sender=Event)
+def event_changed(sender, instance, **kwargs):
+    cache.bump('events-list', f'events:{instance.pk}')
+    calendar.invalidate()
+    transaction.on_commit(calendar.invalidate)
+
+
+@receiver(bookings_changed)
+def event_capacity_changed(sender, event_ids, **kwargs):
+    cache.bump('events-list', *(f'events:{event_id}' for event_id in event_ids))
+
+
+@receiver(bookings_changed)
+def push_seat_counts(sender, event_ids, **kwargs):
+    transaction.on_commit(lambda: streams.publish_seat_counts(event_ids))
@@ -0,0 +1,190 @@
+"""
+Fan-out of seat-count changes to Server-Sent Events subscribers.
+
+Booking writes call `publish_seat_counts()` once they commit. It reads
+the current counters of the affected events and hands one message per
+event to the configured broker (`SEAT_STREAM_BROKER`), which delivers it
+to every subscription watching that event.
+
+Messages carry the absolute `remaining_capacity` rather than a delta, so
+a subscriber that falls behind only needs the latest message per event.
+Each subscription therefore holds at most one pending message per event,
+and newer counts replace older ones. A slow consumer costs bounded
+memory and never blocks the publisher.
+
+Brokers:
+
+- `InProcessBroker` (default) delivers within one process. It fits a
+  single ASGI worker.
+- `CacheBroker` goes through the Django cache. Subscribers poll it, so
+  workers that share a cache backend (file or database) see each other's
+  updates. It is a local stand-in for a real broker such as Redis pub/sub.
+"""
+import asyncio
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+from .models import Event
+
+
+def seat_message(event_id, capacity, confirmed_count, held_count=0):
+    remaining = capacity - confirmed_count - held_count
+    return {'id': event_id, 'remaining_capacity': remaining, 'is_fully_booked': remaining <= 0}
+
+
+class Subscription:
+    """The pending messages of one subscriber, at most one per event."""
+
+    def __init__(self, event_ids):
+        self.event_ids = frozenset(event_ids)
+        self.coalesced = 0
+        self._pending = {}
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+
+    def offer(self, message):
+        """Queue `message` from any thread."""
+        try:
+            self._loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            pass  # the subscriber's loop has already shut down
+
+    def _put(self, message):
+        if message['id'] in self._pending:
+            self.coalesced += 1
+        self._pending[message['id']] = message
+        self._ready.set()
+
+    async def prime(self):
+        """Skip what was published before subscribing; await before reading the snapshot."""
+
+    async def get(self):
+        """Wait for and return the messages queued since the last call."""
+        await self._ready.wait()
+        self._ready.clear()
+        messages, self._pending = list(self._pending.values()), {}
+        return messages
+
+
+class Broker:
+    """Interface between publishers and subscriptions."""
+
+    def wanted(self, event_ids):
+        """The subset of `event_ids` worth publishing."""
+        return set(event_ids)
+
+    def publish(self, messages):
+        raise NotImplementedError
+
+    def subscribe(self, event_ids):
+        """Return a subscription; call from the subscriber's event loop."""
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+
+class InProcessBroker(Broker):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    def wanted(self, event_ids):
+        with self._lock:
+            return {event_id for event_id in event_ids if self._subscriptions.get(event_id)}
+
+    def publish(self, messages):
+        for message in messages:
+            with self._lock:
+                subscriptions = list(self._subscriptions.get(message['id'], ()))
+            for subscription in subscriptions:
+                subscription.offer(message)
+
+    def subscribe(self, event_ids):
+        subscription = Subscription(event_ids)
+        with self._lock:
+            for event_id in subscription.event_ids:
+                self._subscriptions.setdefault(event_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for event_id in subscription.event_ids:
+                subscribers = self._subscriptions.get(event_id, set())
+                subscribers.discard(subscription)
+                if not subscribers:
+                    self._subscriptions.pop(event_id, None)
+
+
+class CacheSubscription(Subscription):
+    def __init__(self, event_ids, broker):
+        super().__init__(event_ids)
+        self._broker = broker
+        self._keys = [broker.key(event_id) for event_id in self.event_ids]
+        self._seen = {}
+
+    async def prime(self):
+        # The cached messages may predate the snapshot, so only later ones count
+        self._seen = {key: token for key, (token, _) in (await cache.aget_many(self._keys)).items()}
+
+    async def get(self):
+        while True:
+            changed = []
+            for key, (token, message) in (await cache.aget_many(self._keys)).items():
+                if self._seen.get(key) != token:
+                    self._seen[key] = token
+                    changed.append(message)
+            if changed:
+                return changed
+            await asyncio.sleep(self._broker.poll_interval)
+
+
+class CacheBroker(Broker):
+    prefix = 'seat-stream:'
+
+    def __init__(self):
+        self.poll_interval = getattr(settings, 'SEAT_STREAM_POLL_INTERVAL', 1.0)
+        self.timeout = getattr(settings, 'SEAT_STREAM_CACHE_TTL', 3600)
+
+    def key(self, event_id):
+        return f'{self.prefix}{event_id}'
+
+    def publish(self, messages):
+        cache.set_many(
+            {self.key(message['id']): (uuid.uuid4().hex, message) for message in messages},
+            self.timeout
+        )
+
+    def subscribe(self, event_ids):
+        return CacheSubscription(event_ids, self)
+
+    def unsubscribe(self, subscription):
+        pass
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.SEAT_STREAM_BROKER)()
+        return _broker
+
+
+def publish_seat_counts(event_ids):
+    """Publish the current seat counts of `event_ids` to their subscribers."""
+    broker = get_broker()
+    event_ids = broker.wanted(event_ids)
+    if not event_ids:
+        return
+    rows = Event.objects.filter(pk__in=event_ids).values_list(
+        'id', 'capacity', 'confirmed_count', 'held_count'
+    )
+    broker.publish([seat_message(*row) for row in rows])
@@ -1,8 +1,11 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import EventViewSet, CountryViewSet
+from .views import EventAvailabilityView, EventViewSet, CountryViewSet
 
 router = DefaultRouter()
 router.register(r'events', EventViewSet)
 router.register(r'countries', CountryViewSet)
 
-urlpatterns = router.urls
+urlpatterns = [
+    path('availability/', EventAvailabilityView.as_view(), name='event-availability'),
+] + router.urls
@@ -1,15 +1,30 @@
+from django.conf import settings
+from django.utils.cache import patch_cache_control
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.permissions import AllowAny, IsAuthenticatedOrReadOnly
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
+from core.cache import CachedResponseMixin
+from core.mixins import ConditionalGetMixin, SparseFieldsetMixin
+from core.search import FullTextSearchFilter, RankedOrderingFilter
+from core.serializers import restrict_queryset
+from .calendar import calendar as event_calendar
+from .filters import EventFilter
 from .models import Event, Country
-from .serializers import EventSerializer, CountrySerializer
+from .serializers import (
+    CountrySerializer, EventAvailabilitySerializer, EventCalendarEntrySerializer,
+    EventCalendarQuerySerializer, EventSerializer,
+)
+from .pagination import EventPagination
 from .permissions import IsEventCreatorOrReadOnly
+from ..bookings.exports import export_bookings
 from ..bookings.serializers import BookingSerializer
 
 
-class CountryViewSet(viewsets.ReadOnlyModelViewSet):
+class CountryViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for viewing countries.
     Only list and retrieve operations are allowed.
@@ -18,38 +33,119 @@ class CountryViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = CountrySerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['name', 'code']
+    cache_namespace = 'countries'
 
 
-class EventViewSet(viewsets.ModelViewSet):
+class EventViewSet(CachedResponseMixin, ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing events.
     """
-    queryset = Event.objects.all()
+    queryset = Event.objects.select_related('created_by').with_capacity()
     serializer_class = EventSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsEventCreatorOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['location', 'is_active', 'start_datetime']
+    pagination_class = EventPagination
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, RankedOrderingFilter]
+    filterset_class = EventFilter
     search_fields = ['title', 'description']
     ordering_fields = ['start_datetime', 'price', 'capacity']
     ordering = ['start_datetime']
+    sparse_actions = ('list', 'retrieve', 'available')
+    cache_namespace = 'events'
+    # Checked by QueryBudgetMiddleware; a little above today's counts
+    query_budgets = {
+        'list': 5,
+        'retrieve': 4,
+        'available': 4,
+        'bookings': 3,
+        'calendar': 3,
+        'update': 5,
+        'partial_update': 5,
+    }
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
     @action(detail=True, methods=['get'])
     def bookings(self, request, pk=None):
-        """Get all bookings for a specific event."""
+        """
+        Get all bookings for a specific event.
+
+        `?export=csv` or `?export=ndjson` streams them as a file instead.
+        """
         event = self.get_object()
-        bookings = event.bookings.select_related('attendee')
-        serializer = BookingSerializer(bookings, many=True)
+        export = request.query_params.get('export')
+        if export:
+            return export_bookings(event.bookings.all(), export, f'event-{event.pk}-bookings')
+
+        context = self.get_serializer_context()
+        bookings = restrict_queryset(
+            event.bookings.with_details(), BookingSerializer(context=context)
+        )
+        serializer = BookingSerializer(bookings, many=True, context=context)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def available(self, request):
-        """Get all events that are not fully booked."""
-        available_events = [
-            event for event in self.get_queryset()
-            if not event.is_fully_booked and event.is_active
-        ]
+        """Get all active events that are not fully booked."""
+        available_events = self.filter_queryset(self.get_queryset()).filter(
+            is_active=True, remaining__gt=0
+        )
+
+        page = self.paginate_queryset(available_events)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
         serializer = self.get_serializer(available_events, many=True)
         return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        """
+        Active events running between `?start=` and `?end=`, optionally in
+        `?location=1,2`, ordered by start time. Served from the in-memory
+        calendar index (see apps/events/calendar.py).
+        """
+        query = EventCalendarQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        entries = event_calendar.between(
+            query.validated_data['start'],
+            query.validated_data['end'],
+            query.validated_data.get('location'),
+        )
+        return Response(EventCalendarEntrySerializer(entries, many=True).data)
+
+
+def parse_event_ids(raw, max_ids):
+    """Parse a comma-separated `?ids=` value into a set of event ids."""
+    try:
+        ids = {int(value) for value in raw.split(',') if value.strip()}
+    except ValueError:
+        raise ValidationError({'ids': "Expected a comma-separated list of event ids."})
+    if not ids:
+        raise ValidationError({'ids': "At least one event id is required."})
+    if len(ids) > max_ids:
+        raise ValidationError({'ids': f"At most {max_ids} event ids are allowed."})
+    return ids
+
+
+class EventAvailabilityView(APIView):
+    """
+    Seat counters for many events in one request: `?ids=1,2,3`.
+
+    Answered from the stored counters with a single query. Unknown ids are
+    left out, and clients may cache the response for a few seconds.
+    """
+    permission_classes = [AllowAny]
+    max_ids = 200
+
+    def get(self, request):
+        ids = parse_event_ids(request.query_params.get('ids', ''), self.max_ids)
+        events = (
+            Event.objects.filter(pk__in=ids)
+            .only('id', 'capacity', 'confirmed_count', 'held_count')
+            .order_by('id')
+        )
+        response = Response(EventAvailabilitySerializer(events, many=True).data)
+        patch_cache_control(response, public=True, max_age=settings.AVAILABILITY_MAX_AGE)
+        return response
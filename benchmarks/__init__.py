@@ -0,0 +1,41 @@
+"""
+Standalone benchmarks for the booking API.
+
+Each module runs against a scratch database created like the test
+database, so it never touches db.sqlite3. Run them from the project root,
+e.g. ``python -m benchmarks.indexes``.
+"""
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+import django
+
+
+def setup():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    django.setup()
+
+
+@contextmanager
+def scratch_database():
+    """Create and migrate a throwaway database, dropping it afterwards."""
+    from django.db import connection
+
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def timed(func, repeat):
+    """Run `func` `repeat` times and return the median wall time in ms."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
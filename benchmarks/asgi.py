@@ -0,0 +1,106 @@
+"""
+Throughput of the event read endpoints: sync views through the WSGI
+handler versus the async views through the ASGI handler.
+
+WSGI requests are served by a pool of `--threads` workers, the way a
+threaded gunicorn worker would. ASGI requests run on one event loop with
+up to `--concurrency` in flight. Both go through Django's request
+handlers in-process (no sockets). The result shows handler and ORM
+overhead at high concurrency, not the effect of slow clients on a real
+server. Measure that with a load generator against gunicorn and uvicorn.
+
+    python -m benchmarks.asgi [--requests 2000] [--concurrency 200] [--threads 8]
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import scratch_database, setup
+
+ENDPOINTS = {
+    'list': ('/api/events/events/', '/api/async/events/'),
+    'available': ('/api/events/events/available/', '/api/async/events/available/'),
+    'detail': ('/api/events/events/{id}/', '/api/async/events/{id}/'),
+}
+
+
+def run_wsgi(urls, total, threads):
+    from django.test import Client
+
+    local = threading.local()
+
+    def get(i):
+        if not hasattr(local, 'client'):
+            local.client = Client()
+        started = time.perf_counter()
+        response = local.client.get(urls[i % len(urls)])
+        assert response.status_code == 200, response.status_code
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        latencies = list(pool.map(get, range(total)))
+    return time.perf_counter() - started, latencies
+
+
+def run_asgi(urls, total, concurrency):
+    from django.test import AsyncClient
+
+    client = AsyncClient()
+
+    async def main():
+        slots = asyncio.Semaphore(concurrency)
+
+        async def get(i):
+            async with slots:
+                started = time.perf_counter()
+                response = await client.get(urls[i % len(urls)])
+                assert response.status_code == 200, response.status_code
+                return time.perf_counter() - started
+
+        return await asyncio.gather(*(get(i) for i in range(total)))
+
+    started = time.perf_counter()
+    latencies = asyncio.run(main())
+    return time.perf_counter() - started, latencies
+
+
+def report(label, elapsed, latencies):
+    ms = sorted(latency * 1000 for latency in latencies)
+    p95 = ms[int(len(ms) * 0.95) - 1]
+    print(
+        f'  {label:<5} {len(ms) / elapsed:8.1f} req/s'
+        f'  p50 {statistics.median(ms):8.2f} ms  p95 {p95:8.2f} ms'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    setup()
+    from django.test.utils import override_settings, setup_test_environment
+
+    from .seed import seed
+
+    setup_test_environment(debug=False)
+    with scratch_database(), override_settings(RESPONSE_CACHE_ENABLED=False):
+        print(f'Seeding {args.events} events...')
+        event_ids = seed(args.events, attendees=1000, bookings=5000)
+        for name, (sync_url, async_url) in ENDPOINTS.items():
+            sync_urls = [sync_url.format(id=event_id) for event_id in event_ids[:50]]
+            async_urls = [async_url.format(id=event_id) for event_id in event_ids[:50]]
+            print(f'\n{name} ({args.requests} requests)')
+            report('wsgi', *run_wsgi(sync_urls, args.requests, args.threads))
+            report('asgi', *run_asgi(async_urls, args.requests, args.concurrency))
+
+
+if __name__ == '__main__':
+    main()
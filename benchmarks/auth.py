@@ -0,0 +1,71 @@
+"""
+Per-request overhead of authenticating with a JWT: simplejwt's
+JWTAuthentication (one user query per request) versus
+CachedJWTAuthentication (user cache hit).
+
+Times `authenticate()` alone and a full authenticated request to
+`PATCH /api/events/events/<id>/` that the permission check rejects.
+That request authenticates, loads the event and runs
+IsEventCreatorOrReadOnly, and it writes nothing.
+
+    python -m benchmarks.auth [--repeat 2000]
+"""
+import argparse
+
+from . import scratch_database, setup, timed
+
+CLASSES = {
+    'simplejwt': 'rest_framework_simplejwt.authentication.JWTAuthentication',
+    'cached': 'core.authentication.CachedJWTAuthentication',
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client
+    from django.test.client import RequestFactory
+    from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment
+    from django.utils.module_loading import import_string
+    from rest_framework.request import Request
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from apps.events.views import EventViewSet
+
+    from .seed import seed
+
+    setup_test_environment(debug=False)
+    with scratch_database(), override_settings(RESPONSE_CACHE_ENABLED=False):
+        event_id = seed(1, attendees=1, bookings=0)[0]
+        user = User.objects.create_user('benchmark', password='benchmark')
+        header = f'Bearer {AccessToken.for_user(user)}'
+        request = Request(RequestFactory().get('/', HTTP_AUTHORIZATION=header))
+
+        print(f'{"":<10} {"authenticate()":>16} {"request":>12} {"user queries":>14}')
+        original = EventViewSet.authentication_classes
+        for name, path in CLASSES.items():
+            authenticator = import_string(path)()
+            authenticator.authenticate(request)
+            auth_ms = timed(lambda: authenticator.authenticate(request), args.repeat)
+
+            EventViewSet.authentication_classes = [import_string(path)]
+            client = Client(HTTP_AUTHORIZATION=header)
+            url = f'/api/events/events/{event_id}/'
+            client.patch(url, '{}', content_type='application/json')
+            with CaptureQueriesContext(connection) as queries:
+                response = client.patch(url, '{}', content_type='application/json')
+            assert response.status_code == 403, response.status_code
+            # Count now: every request resets the connection's query log
+            user_queries = sum('FROM "auth_user"' in query['sql'] for query in queries.captured_queries)
+            request_ms = timed(lambda: client.patch(url, '{}', content_type='application/json'), args.repeat // 10)
+            print(f'{name:<10} {auth_ms * 1000:>13.1f} us {request_ms:>9.2f} ms {user_queries:>14}')
+        EventViewSet.authentication_classes = original
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+EXPLAIN plans and latency of the API's access paths, with and without
+the models' Meta.indexes.
+
+    python -m benchmarks.indexes [--bookings 200000] [--repeat 20]
+"""
+import argparse
+
+from . import scratch_database, setup, timed
+
+
+def access_paths(event_id, now):
+    from apps.attendees.models import Attendee
+    from apps.bookings.models import Booking
+    from apps.events.models import Event
+
+    return {
+        'confirmed bookings of an event': Booking.objects.filter(event_id=event_id, status='confirmed').order_by(),
+        'bookings ?status= newest first': Booking.objects.filter(status='pending').order_by('-booking_date')[:20],
+        'bookings keyset page': Booking.objects.order_by('-booking_date', 'id')[:20],
+        'events ?is_active= by start': Event.objects.filter(is_active=True, start_datetime__gte=now)[:20],
+        'events ?location= by start': Event.objects.filter(location_id=1).order_by('start_datetime')[:20],
+        'attendees by name': Attendee.objects.order_by('last_name', 'first_name', 'id')[:20],
+    }
+
+
+def plan(queryset):
+    return ' / '.join(
+        line.strip() for line in queryset.explain().splitlines() if line.strip()
+    )
+
+
+def measure(paths, repeat):
+    return {
+        name: (plan(queryset), timed(lambda qs=queryset: list(qs.all()), repeat))
+        for name, queryset in paths.items()
+    }
+
+
+def toggle_indexes(connection, create):
+    from apps.attendees.models import Attendee
+    from apps.bookings.models import Booking
+    from apps.events.models import Event
+
+    with connection.schema_editor() as editor:
+        for model in (Event, Booking, Attendee):
+            for index in model._meta.indexes:
+                if create:
+                    editor.add_index(model, index)
+                else:
+                    editor.remove_index(model, index)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--attendees', type=int, default=20000)
+    parser.add_argument('--bookings', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    from django.utils import timezone
+
+    from .seed import seed
+
+    with scratch_database() as connection:
+        print(f'Seeding {args.events} events, {args.attendees} attendees, {args.bookings} bookings...')
+        event_ids = seed(args.events, args.attendees, args.bookings)
+        paths = access_paths(event_ids[len(event_ids) // 2], timezone.now())
+
+        toggle_indexes(connection, create=False)
+        before = measure(paths, args.repeat)
+        toggle_indexes(connection, create=True)
+        after = measure(paths, args.repeat)
+
+    for name in paths:
+        (plan_before, ms_before), (plan_after, ms_after) = before[name], after[name]
+        print(f'\n{name}')
+        print(f'  before {ms_before:8.3f} ms  {plan_before}')
+        print(f'  after  {ms_after:8.3f} ms  {plan_after}')
+
+
+if __name__ == '__main__':
+    main()
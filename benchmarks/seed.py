@@ -0,0 +1,69 @@
+"""Bulk seeding of a scratch database with realistic-looking data."""
+import random
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from apps.attendees.models import Attendee
+from apps.bookings.models import Booking
+from apps.events.models import Country, Event
+
+STATUSES = ['pending', 'confirmed', 'confirmed', 'confirmed', 'cancelled']
+
+
+def seed(events=2000, attendees=20000, bookings=200000, countries=20, batch_size=5000):
+    rng = random.Random(42)
+    now = timezone.now()
+    user = User.objects.create_user(username='bench', password='bench')
+
+    Country.objects.bulk_create(
+        Country(name=f'Country {i}', code=f'C{i:02d}') for i in range(countries)
+    )
+    country_ids = list(Country.objects.values_list('id', flat=True))
+
+    Event.objects.bulk_create(
+        (
+            Event(
+                title=f'Event {i}',
+                description='Benchmark event ' * 20,
+                start_datetime=now + timedelta(hours=rng.randint(-2000, 8000)),
+                end_datetime=now + timedelta(hours=rng.randint(8001, 9000)),
+                location_id=rng.choice(country_ids),
+                capacity=rng.randint(50, 500),
+                price=rng.randint(0, 300),
+                is_active=rng.random() > 0.2,
+                created_by=user,
+            )
+            for i in range(events)
+        ),
+        batch_size=batch_size,
+    )
+    event_ids = list(Event.objects.values_list('id', flat=True))
+
+    Attendee.objects.bulk_create(
+        (
+            Attendee(
+                first_name=f'First{rng.randint(0, 500)}',
+                last_name=f'Last{rng.randint(0, 2000)}',
+                email=f'bench{i}@example.com',
+                phone='1234567890',
+                date_of_birth=date(1990, 1, 1),
+            )
+            for i in range(attendees)
+        ),
+        batch_size=batch_size,
+    )
+    attendee_ids = list(Attendee.objects.values_list('id', flat=True))
+
+    pairs = set()
+    while len(pairs) < bookings:
+        pairs.add((rng.choice(event_ids), rng.choice(attendee_ids)))
+    Booking.objects.bulk_create(
+        (
+            Booking(event_id=event_id, attendee_id=attendee_id, status=rng.choice(STATUSES))
+            for event_id, attendee_id in pairs
+        ),
+        batch_size=batch_size,
+    )
+    return event_ids
@@ -0,0 +1,93 @@
+"""
+JWT authentication that resolves users through a per-process cache.
+
+`CachedJWTAuthentication` validates the token exactly like simplejwt's
+`JWTAuthentication`, then looks the user up in a small LRU cache instead of
+querying `auth_user` on every request. Entries live for AUTH_USER_CACHE_TTL
+seconds. Saving or deleting a user drops its entry in the process that
+made the change. Changes made elsewhere (another worker, or a queryset
+`.update()`) show up once the entry expires, so the TTL bounds how long a
+deactivated user or changed password can still be honoured.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class UserCache:
+    """A thread-safe LRU of users keyed by their token id, with a TTL."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = OrderedDict()
+
+    def get(self, user_id, load):
+        """Return the cached user for `user_id`, calling `load(user_id)` on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._users.move_to_end(user_id)
+                return entry[0]
+
+        user = load(user_id)
+        if user is not None:
+            with self._lock:
+                self._users[user_id] = (user, now + settings.AUTH_USER_CACHE_TTL)
+                self._users.move_to_end(user_id)
+                while len(self._users) > settings.AUTH_USER_CACHE_SIZE:
+                    self._users.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id=None):
+        """Forget one user, or everyone when `user_id` is None."""
+        with self._lock:
+            if user_id is None:
+                self._users.clear()
+            else:
+                self._users.pop(user_id, None)
+
+
+users = UserCache()
+
+
+def user_changed(sender, instance, **kwargs):
+    users.invalidate(getattr(instance, api_settings.USER_ID_FIELD))
+
+
+post_save.connect(user_changed, sender=settings.AUTH_USER_MODEL, dispatch_uid='core.authentication.user_changed')
+post_delete.connect(user_changed, sender=settings.AUTH_USER_MODEL, dispatch_uid='core.authentication.user_changed')
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def _load_user(self, user_id):
+        return self.user_model.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = users.get(user_id, self._load_user)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        # Each request gets its own copy, so nothing it sets leaks into others
+        return copy.copy(user)
@@ -0,0 +1,139 @@
+"""
+Versioned read-through cache for rendered API responses.
+
+Cached responses are keyed by the request path, its query parameters, the
+negotiated renderer and the current version token of every scope the
+response depends on (e.g. ``events`` and ``events:42``). Invalidation
+never deletes entries: bumping a scope swaps its token, so every response
+built from it stops matching and simply ages out of the cache.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import parse_http_date_safe
+
+VERSION_PREFIX = 'response-cache:version:'
+RESPONSE_PREFIX = 'response-cache:response:'
+
+
+def _versions(scopes):
+    keys = [VERSION_PREFIX + scope for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Unknown (or evicted) scope: start it on a fresh token
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def _bump_now(scopes):
+    cache.set_many({VERSION_PREFIX + scope: uuid.uuid4().hex for scope in scopes}, None)
+
+
+def bump(*scopes):
+    """
+    Invalidate every cached response that depends on any of `scopes`.
+
+    The bump happens immediately and again once the surrounding transaction
+    commits, so a response rendered from pre-commit data cannot outlive it.
+    """
+    _bump_now(scopes)
+    transaction.on_commit(lambda: _bump_now(scopes))
+
+
+def _etag(content):
+    return '"%s"' % hashlib.md5(content, usedforsecurity=False).hexdigest()
+
+
+def _not_modified(request, etag, last_modified):
+    response = get_conditional_response(
+        request, etag=etag, last_modified=parse_http_date_safe(last_modified or '')
+    )
+    return response is not None and response.status_code == 304
+
+
+class CachedResponseMixin:
+    """
+    Serve list and retrieve responses from the cache when nothing they
+    depend on has changed, and answer matching `If-None-Match` with 304.
+    Validators already set by the view (see ConditionalGetMixin) are kept;
+    otherwise the ETag is a hash of the content.
+
+    Views set `cache_namespace` (e.g. 'events'). Lists depend on the
+    namespace and its `-list` scope; a detail view on the namespace and
+    `<namespace>:<pk>`. Signal handlers call `bump()` with the same names.
+    """
+    cache_namespace = None
+
+    def get_cache_ttl(self):
+        return settings.RESPONSE_CACHE_TTL.get(self.cache_namespace, 60)
+
+    def get_cache_scopes(self):
+        if self.action == 'retrieve':
+            return [self.cache_namespace, f'{self.cache_namespace}:{self.kwargs[self.lookup_field]}']
+        return [self.cache_namespace, f'{self.cache_namespace}-list']
+
+    def get_cache_key(self, request):
+        query = sorted(request.query_params.lists())
+        parts = [
+            request.path,
+            repr(query),
+            request.accepted_renderer.format,
+            *_versions(self.get_cache_scopes()),
+        ]
+        digest = hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest()
+        return RESPONSE_PREFIX + digest
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return handler(request, *args, **kwargs)
+
+        key = self.get_cache_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type, etag, last_modified = cached
+            if _not_modified(request, etag, last_modified):
+                response = HttpResponseNotModified()
+            else:
+                response = HttpResponse(content, content_type=content_type)
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = last_modified
+            response['X-Cache'] = 'HIT'
+            patch_vary_headers(response, ['Accept'])
+            return response
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+
+        def store(rendered):
+            etag = rendered.get('ETag') or _etag(rendered.content)
+            last_modified = rendered.get('Last-Modified')
+            cache.set(
+                key,
+                (rendered.content, rendered['Content-Type'], etag, last_modified),
+                self.get_cache_ttl()
+            )
+            rendered['ETag'] = etag
+            rendered['X-Cache'] = 'MISS'
+            if _not_modified(request, etag, last_modified):
+                not_modified = HttpResponseNotModified()
+                not_modified['ETag'] = etag
+                return not_modified
+            return rendered
+
+        response.add_post_render_callback(store)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
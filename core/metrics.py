@@ -0,0 +1,259 @@
+"""
+Per-route request metrics.
+
+`RequestMetricsMiddleware` samples METRICS_SAMPLE_RATE of the requests. For
+each sampled request it records:
+
+- wall time;
+- number of queries and time spent in the database;
+- time spent serializing (the root `to_representation` of serializers using
+  `DynamicFieldsMixin`);
+- response size.
+
+Samples are grouped by route, the URL name such as `event-list` or
+`booking-confirm`.
+
+Queries are counted by a wrapper installed with the execute_wrappers
+mechanism behind `connection.execute_wrapper()` on every connection. It
+reports to the probe of the current request, found through a context
+variable, so queries that async views run in worker threads are counted as
+well. Outside a sampled request the wrapper only passes the query through.
+
+Each route keeps its latest METRICS_WINDOW samples for percentiles, plus
+running totals. `GET /api/_metrics/` (admin only) shows them as JSON, or in
+the Prometheus text format with `?format=prometheus`. Numbers are per
+process.
+"""
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+# Each measurement: its JSON key, how JSON scales it and its Prometheus name
+MEASUREMENTS = {
+    'duration': ('wall_ms', 1000, 'api_request_duration_seconds'),
+    'db_queries': ('db_queries', 1, 'api_request_db_queries'),
+    'db_duration': ('db_ms', 1000, 'api_request_db_duration_seconds'),
+    'serialize_duration': ('serialize_ms', 1000, 'api_request_serialize_duration_seconds'),
+    'response_size': ('response_bytes', 1, 'api_response_size_bytes'),
+}
+QUANTILES = (0.5, 0.9, 0.99)
+
+_probe = ContextVar('request_metrics_probe', default=None)
+
+
+class Probe:
+    """What one sampled request spent, filled in while it runs."""
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_duration = 0.0
+        self.serialize_duration = 0.0
+
+
+def _count_queries(execute, sql, params, many, context):
+    probe = _probe.get()
+    if probe is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        probe.db_queries += 1
+        probe.db_duration += time.perf_counter() - started
+
+
+def install_query_counter(connection, **kwargs):
+    if _count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_queries)
+
+
+connection_created.connect(install_query_counter, dispatch_uid='core.metrics.install_query_counter')
+
+
+@contextmanager
+def timing_serialization():
+    """Add the time spent in the block to the current request's serialization time."""
+    probe = _probe.get()
+    if probe is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        probe.serialize_duration += time.perf_counter() - started
+
+
+def _quantile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class RouteStats:
+    def __init__(self, window):
+        self.requests = 0
+        self.counts = dict.fromkeys(MEASUREMENTS, 0)
+        self.sums = dict.fromkeys(MEASUREMENTS, 0)
+        self.samples = {name: deque(maxlen=window) for name in MEASUREMENTS}
+
+    def add(self, values):
+        self.requests += 1
+        for name, value in values.items():
+            self.counts[name] += 1
+            self.sums[name] += value
+            self.samples[name].append(value)
+
+    def summary(self):
+        summary = {'requests': self.requests}
+        for name in MEASUREMENTS:
+            ordered = sorted(self.samples[name])
+            summary[name] = {
+                'count': self.counts[name],
+                'sum': self.sums[name],
+                'quantiles': {q: _quantile(ordered, q) for q in QUANTILES} if ordered else {},
+                'max': ordered[-1] if ordered else None,
+            }
+        return summary
+
+
+class RequestMetrics:
+    """Thread-safe per-route samples and totals."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._routes = {}
+
+    def record(self, route, values):
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = RouteStats(settings.METRICS_WINDOW)
+            stats.add(values)
+
+    def snapshot(self):
+        with self._lock:
+            return {route: stats.summary() for route, stats in sorted(self._routes.items())}
+
+
+metrics = RequestMetrics()
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _sampled(self):
+        rate = settings.METRICS_SAMPLE_RATE
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        install_query_counter(connection)
+        probe = Probe()
+        token = _probe.set(probe)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _probe.reset(token)
+        self.record(request, response, time.perf_counter() - started, probe)
+        return response
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        probe = Probe()
+        token = _probe.set(probe)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _probe.reset(token)
+        self.record(request, response, time.perf_counter() - started, probe)
+        return response
+
+    def record(self, request, response, duration, probe):
+        match = request.resolver_match
+        values = {
+            'duration': duration,
+            'db_queries': probe.db_queries,
+            'db_duration': probe.db_duration,
+            'serialize_duration': probe.serialize_duration,
+        }
+        # Streams end after the view returns, so their size is unknown here
+        if not response.streaming:
+            values['response_size'] = len(response.content)
+        metrics.record(match.url_name if match and match.url_name else 'unmatched', values)
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if 'routes' not in data:  # an error response
+            return '\n'.join(f'# {key}: {value}' for key, value in data.items()).encode(self.charset)
+        lines = []
+        for name, (_, _, metric) in MEASUREMENTS.items():
+            lines.append(f'# TYPE {metric} summary')
+            for route, summary in data['routes'].items():
+                labels = f'route="{route}"'
+                for q, value in summary[name]['quantiles'].items():
+                    lines.append(f'{metric}{{{labels},quantile="{q}"}} {value}')
+                lines.append(f'{metric}_sum{{{labels}}} {summary[name]["sum"]}')
+                lines.append(f'{metric}_count{{{labels}}} {summary[name]["count"]}')
+        return ('\n'.join(lines) + '\n').encode(self.charset)
+
+
+def _as_json(summary):
+    """Milliseconds instead of seconds, and p50-style keys for the quantiles."""
+    result = {'requests': summary['requests']}
+    for name, (key, scale, _) in MEASUREMENTS.items():
+        measured = summary[name]
+        values = {f'p{round(q * 100)}': value * scale for q, value in measured['quantiles'].items()}
+        values['max'] = measured['max'] * scale if measured['max'] is not None else None
+        values['avg'] = measured['sum'] * scale / measured['count'] if measured['count'] else None
+        result[key] = values
+    return result
+
+
+class MetricsView(APIView):
+    """Per-route request metrics of this process, for admins."""
+    permission_classes = [IsAdminUser]
+    renderer_classes = [JSONRenderer, PrometheusRenderer]
+
+    def get(self, request):
+        routes = metrics.snapshot()
+        if request.accepted_renderer.format == 'prometheus':
+            return Response({'routes': routes})
+        return Response({
+            'sample_rate': settings.METRICS_SAMPLE_RATE,
+            'routes': {route: _as_json(summary) for route, summary in routes.items()},
+        })
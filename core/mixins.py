@@ -0,0 +1,128 @@
+import hashlib
+import json
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .pagination import KeysetPagination, SelectablePagination
+from .serializers import _split_param, restrict_queryset
+
+
+class SparseFieldsetMixin:
+    """
+    Fetch only the columns a read response will actually render.
+
+    The serializer for the request (honouring `?fields=` and `?expand=`) is
+    turned into `.only()` / `.select_related()` on the view's queryset.
+    """
+    sparse_actions = ('list', 'retrieve')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in self.sparse_actions:
+            queryset = restrict_queryset(queryset, self.get_serializer())
+        return queryset
+
+
+class ConditionalGetMixin:
+    """
+    Answer conditional list and retrieve requests without serializing.
+
+    The validators come from one aggregate over the rows the response would
+    be built from: the newest `updated_at` and the row count (so deletions
+    change them too). The ETag also covers the query string and renderer,
+    since those change the representation. A matching `If-None-Match` or
+    `If-Modified-Since` gets a 304.
+
+    Keyset (`?cursor=`) pages skip the aggregate, which would scan the whole
+    filtered table: their ETag is a hash of the page that was served, and
+    they carry no `Last-Modified`.
+
+    `expanded_last_modified` maps `?expand=` names to the related
+    `updated_at` lookups whose changes the expanded response depends on.
+    """
+    last_modified_field = 'updated_at'
+    expanded_last_modified = {}
+
+    def get_last_modified_fields(self):
+        fields = [self.last_modified_field]
+        for name in sorted(_split_param(self.request, 'expand')):
+            if name in self.expanded_last_modified:
+                fields.append(self.expanded_last_modified[name])
+        return fields
+
+    def get_validators(self, request):
+        """Return `(etag, last_modified)` for the response, or None if there are no rows."""
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == 'retrieve':
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+
+        fields = self.get_last_modified_fields()
+        aggregates = {f'last_modified_{i}': Max(field) for i, field in enumerate(fields)}
+        values = queryset.select_related(None).order_by().aggregate(rows=Count('pk'), **aggregates)
+        if self.action == 'retrieve' and not values['rows']:
+            return None
+
+        timestamps = [values[name] for name in aggregates if values[name] is not None]
+        last_modified = max(timestamps) if timestamps else None
+        parts = [
+            repr(sorted(request.query_params.lists())),
+            request.accepted_renderer.format,
+            str(values['rows']),
+            *(values[name].isoformat() if values[name] else '' for name in aggregates),
+        ]
+        digest = hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest()
+        return f'W/"{digest}"', last_modified
+
+    def is_keyset_page(self, request):
+        paginator = self.paginator
+        if self.action != 'list' or paginator is None:
+            return False
+        if isinstance(paginator, SelectablePagination):
+            return paginator.selects_keyset(request)
+        return isinstance(paginator, KeysetPagination)
+
+    def page_response(self, handler, request, *args, **kwargs):
+        """Serve a keyset page, validated by a hash of its own data."""
+        response = handler(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        parts = [
+            request.accepted_renderer.format,
+            json.dumps(response.data, sort_keys=True, default=str),
+        ]
+        digest = hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest()
+        etag = f'W/"{digest}"'
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            response = not_modified
+        response['ETag'] = etag
+        return response
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        if self.is_keyset_page(request):
+            return self.page_response(handler, request, *args, **kwargs)
+
+        validators = self.get_validators(request)
+        if validators is None:
+            return handler(request, *args, **kwargs)
+
+        etag, last_modified = validators
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
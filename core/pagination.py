@@ -0,0 +1,211 @@
+import base64
+import json
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _encode_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a fixed, unique ordering.
+
+    Each page is fetched with `WHERE (a, b) > (last_a, last_b) ORDER BY a, b
+    LIMIT n`, so it costs the same however deep the client pages and no
+    `COUNT(*)` is issued. `ordering` must end in a unique field (usually
+    `id`) and should be backed by a matching composite index.
+
+    Pages always follow `ordering`. A conflicting `?ordering=` is refused
+    with a 400, and search results come in `ordering` rather than best
+    match first.
+    """
+    ordering = ('id',)
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.check_ordering(request, view)
+        self.fields = [
+            (name.lstrip('-'), name.startswith('-'), queryset.model._meta.get_field(name.lstrip('-')))
+            for name in self.ordering
+        ]
+
+        values, reverse = self.decode_cursor(request)
+        # Read the key columns as annotations so they are there even when
+        # sparse fieldsets deferred them
+        queryset = queryset.annotate(**{
+            f'keyset_{i}': F(name) for i, (name, _, _) in enumerate(self.fields)
+        })
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, reverse))
+        queryset = queryset.order_by(*self._order_by(reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            self.has_next, self.has_previous = values is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+        self.page = rows
+        return rows
+
+    def check_ordering(self, request, view):
+        """Refuse an `?ordering=` other than a prefix of `ordering`, which pages could not follow."""
+        for backend in getattr(view, 'filter_backends', ()):
+            if not issubclass(backend, OrderingFilter):
+                continue
+            param = backend.ordering_param
+            requested = [name.strip() for name in request.query_params.get(param, '').split(',') if name.strip()]
+            if requested and requested != list(self.ordering[:len(requested)]):
+                raise ValidationError({
+                    param: f"Cursor pages are ordered by {', '.join(self.ordering)}; use ?page= for other orderings."
+                })
+
+    def _order_by(self, reverse):
+        return [
+            f"{'-' if descending != reverse else ''}{name}"
+            for name, descending, _ in self.fields
+        ]
+
+    def _seek(self, values, reverse):
+        """Build `(a, b, ...) > (x, y, ...)` honouring each column's direction."""
+        condition = Q()
+        for i, (name, descending, _) in enumerate(self.fields):
+            lookup = 'lt' if descending != reverse else 'gt'
+            clause = Q(**{f'{name}__{lookup}': values[i]})
+            for j in range(i):
+                clause &= Q(**{self.fields[j][0]: values[j]})
+            condition |= clause
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            if len(payload['v']) != len(self.fields):
+                raise ValueError
+            values = [
+                field.to_python(value)
+                for (_, _, field), value in zip(self.fields, payload['v'])
+            ]
+            return values, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, DjangoValidationError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        payload = {
+            'v': [_encode_value(getattr(obj, f'keyset_{i}')) for i in range(len(self.fields))],
+            'r': int(reverse),
+        }
+        encoded = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_page_size(self, request):
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(requested, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class SelectablePagination(BasePagination):
+    """
+    Keyset pagination or classic page numbers, chosen per request.
+
+    `?cursor=` (empty for the first page) selects keyset pagination and
+    `?page=` selects page numbers. Requests with neither use the
+    `PAGINATION_STYLE` setting ('page' unless configured otherwise).
+    Subclasses set `ordering` to the keyset the view is paged by.
+    """
+    ordering = ('id',)
+    keyset_class = KeysetPagination
+    page_number_class = PageNumberPagination
+
+    def selects_keyset(self, request):
+        """Return True if `request` is paged with keyset pagination."""
+        if self.keyset_class.cursor_query_param in request.query_params:
+            return True
+        if self.page_number_class.page_query_param in request.query_params:
+            return False
+        return getattr(settings, 'PAGINATION_STYLE', 'page') == 'cursor'
+
+    def _select(self, request):
+        if self.selects_keyset(request):
+            paginator = self.keyset_class()
+            paginator.ordering = self.ordering
+            return paginator
+        return self.page_number_class()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self._select(request)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_class().get_paginated_response_schema(schema)
+
+    def get_schema_fields(self, view):
+        return self.page_number_class().get_schema_fields(view)
+
+    def get_schema_operation_parameters(self, view):
+        return self.page_number_class().get_schema_operation_parameters(view)
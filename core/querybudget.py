@@ -0,0 +1,231 @@
+"""
+Query budgets: catch N+1 queries and query-count regressions.
+
+`query_budget(max_queries=..., max_repeats=...)` is a context manager and
+decorator. It watches the queries run inside it through
+`connection.execute_wrapper()` and raises QueryBudgetExceeded if there
+were more than `max_queries`, or if one SQL shape (the statement with its
+literals and IN-list lengths stripped) ran more than `max_repeats` times,
+the signature of an N+1.
+
+`QueryBudgetMiddleware` applies the same check to every request. Views
+declare their budget as `query_budget` (a number) or `query_budgets` (per
+action, e.g. `{'list': 4}`), and QUERY_REPEAT_LIMIT caps repeats
+everywhere. QUERY_BUDGET_MODE picks what happens when a request breaks a
+budget:
+
+- `off`: the middleware removes itself.
+- `raise`: the request fails with QueryBudgetExceeded. `QueryBudgetRunner`,
+  the project's test runner, switches this on, so a regression fails the
+  test that made the request.
+- `log`: for staging. The endpoint, the problem and the stack that ran the
+  offending query are logged to `core.querybudget`, along with any query
+  slower than QUERY_SLOW_MS.
+"""
+import logging
+import re
+import time
+import traceback
+from collections import Counter
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.test.runner import DiscoverRunner
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LISTS = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+# Transaction bookkeeping, not work a view asked for
+_IGNORED = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+_request_log = ContextVar('query_budget_log', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def sql_shape(sql):
+    """`sql` with literals replaced by `?` and IN lists collapsed."""
+    return _PLACEHOLDER_LISTS.sub('(...)', _LITERALS.sub('?', sql))
+
+
+def _caller_stack():
+    """The project's own frames of the current stack, innermost last."""
+    root = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-3]
+        if frame.filename.startswith(root) and 'site-packages' not in frame.filename
+        and frame.filename != __file__
+    ]
+    return ''.join(traceback.format_list(frames))
+
+
+class QueryLog:
+    """An execute wrapper counting queries by shape."""
+
+    def __init__(self, max_queries=None, max_repeats=None, slow_ms=None, capture_stacks=False):
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats
+        self.slow_ms = slow_ms
+        self.capture_stacks = capture_stacks
+        self.count = 0
+        self.shapes = Counter()
+        self.stacks = {}
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self._record(sql, (time.perf_counter() - started) * 1000)
+
+    def _record(self, sql, elapsed_ms):
+        if sql.lstrip().upper().startswith(_IGNORED):
+            return
+        self.count += 1
+        shape = sql_shape(sql)
+        self.shapes[shape] += 1
+        if self.capture_stacks:
+            # Keep the stack of the first query over each limit
+            if self.max_repeats is not None and self.shapes[shape] == self.max_repeats + 1:
+                self.stacks[shape] = _caller_stack()
+            if self.max_queries is not None and self.count == self.max_queries + 1:
+                self.stacks.setdefault(None, _caller_stack())
+        if self.slow_ms is not None and elapsed_ms > self.slow_ms:
+            self.slow.append((elapsed_ms, sql, _caller_stack() if self.capture_stacks else None))
+
+    def problems(self):
+        """Describe each broken limit as `(message, stack or None)`."""
+        found = []
+        if self.max_queries is not None and self.count > self.max_queries:
+            found.append((f"{self.count} queries, budget is {self.max_queries}", self.stacks.get(None)))
+        if self.max_repeats is not None:
+            for shape, times in self.shapes.most_common():
+                if times <= self.max_repeats:
+                    break
+                found.append((f"ran {times} times (limit {self.max_repeats}): {shape}", self.stacks.get(shape)))
+        return found
+
+
+class query_budget(ContextDecorator):
+    """
+    Fail if the block runs more than `max_queries` queries, or any SQL shape
+    more than `max_repeats` times.
+    """
+
+    def __init__(self, max_queries=None, max_repeats=None, using=DEFAULT_DB_ALIAS):
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats
+        self.using = using
+
+    def __enter__(self):
+        self.log = QueryLog(self.max_queries, self.max_repeats)
+        self._wrapper = connections[self.using].execute_wrapper(self.log)
+        self._wrapper.__enter__()
+        return self.log
+
+    def __exit__(self, exc_type, exc, tb):
+        self._wrapper.__exit__(exc_type, exc, tb)
+        problems = self.log.problems()
+        if exc_type is None and problems:
+            raise QueryBudgetExceeded('\n'.join(message for message, _ in problems))
+        return False
+
+
+def declared_budget(request, match):
+    """The query budget of the view `match` resolved to, if it declares one."""
+    view = getattr(match.func, 'cls', None) if match else None
+    if view is None:
+        return None
+    budgets = getattr(view, 'query_budgets', None)
+    actions = getattr(match.func, 'actions', None)
+    if budgets is not None and actions:
+        return budgets.get(actions.get(request.method.lower()))
+    return getattr(view, 'query_budget', None)
+
+
+def _record_queries(execute, sql, params, many, context):
+    log = _request_log.get()
+    if log is None:
+        return execute(sql, params, many, context)
+    return log(execute, sql, params, many, context)
+
+
+def install_query_log(connection, **kwargs):
+    if _record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_queries)
+
+
+class QueryBudgetMiddleware:
+    """
+    Check each request against its view's query budget and the repeat limit.
+
+    Queries are seen through a wrapper installed on every connection, which
+    reports to the current request's QueryLog through a context variable.
+    The ORM calls async views make in sync_to_async threads, on those
+    threads' own connections, are therefore counted too. Use it in tests
+    and staging; with QUERY_BUDGET_MODE=off it is not loaded at all.
+    """
+
+    def __init__(self, get_response):
+        if settings.QUERY_BUDGET_MODE == 'off':
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        connection_created.connect(install_query_log, dispatch_uid='core.querybudget.install_query_log')
+
+    def __call__(self, request):
+        mode = settings.QUERY_BUDGET_MODE
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            match = None
+        log = QueryLog(
+            max_queries=declared_budget(request, match),
+            max_repeats=settings.QUERY_REPEAT_LIMIT,
+            slow_ms=settings.QUERY_SLOW_MS if mode == 'log' else None,
+            capture_stacks=mode == 'log',
+        )
+        for connection in connections.all(initialized_only=True):
+            install_query_log(connection)
+        token = _request_log.set(log)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_log.reset(token)
+        self.report(request, match, log, mode)
+        return response
+
+    def report(self, request, match, log, mode):
+        problems = log.problems()
+        endpoint = f'{request.method} {request.path} ({match.view_name if match else "unmatched"})'
+        if mode == 'raise':
+            if problems:
+                raise QueryBudgetExceeded(f'{endpoint}:\n' + '\n'.join(message for message, _ in problems))
+            return
+        if mode != 'log':
+            return
+        for message, stack in problems:
+            logger.warning("Query budget exceeded by %s: %s\n%s", endpoint, message, stack or '')
+        for elapsed_ms, sql, stack in log.slow:
+            logger.warning("Slow query (%.1f ms) in %s: %s\n%s", elapsed_ms, endpoint, sql, stack or '')
+
+
+class QueryBudgetRunner(DiscoverRunner):
+    """The test runner: fails any request that breaks its query budget."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._saved_mode = settings.QUERY_BUDGET_MODE
+        settings.QUERY_BUDGET_MODE = 'raise'
+
+    def teardown_test_environment(self, **kwargs):
+        settings.QUERY_BUDGET_MODE = self._saved_mode
+        super().teardown_test_environment(**kwargs)
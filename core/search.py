@@ -0,0 +1,145 @@
+"""
+Ranked full-text search over an inverted index instead of LIKE scans.
+
+`FullTextIndex` describes an index over some text columns of one table:
+
+- SQLite: an external-content FTS5 table (`<table>_fts`) kept in sync by
+  triggers on the source table.
+- PostgreSQL: a GIN index on the `to_tsvector('simple', ...)` document of
+  the columns, which the search query repeats so the planner can use it.
+
+Migrations create the index with `FullTextIndex(...).install()`. On SQLite,
+a migration that rebuilds the source table drops its triggers; run
+`python manage.py rebuild_search_indexes` after one.
+
+`FullTextSearchFilter` is a drop-in replacement for DRF's `SearchFilter`
+that reads the view's `search_fields`. Every word of `?search=` must match
+the start of a word in one of the fields (so `?search=jo sm` finds "John
+Smith"), and results come best match first. On other backends it falls
+back to `SearchFilter`'s `icontains` lookups.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import OrderingFilter, SearchFilter
+
+WORD = re.compile(r'\w+')
+
+
+class FullTextIndex:
+    def __init__(self, table, columns):
+        self.table = table
+        self.columns = list(columns)
+
+    @classmethod
+    def for_model(cls, model, field_names):
+        return cls(model._meta.db_table, [model._meta.get_field(name).column for name in field_names])
+
+    @property
+    def name(self):
+        return f'{self.table}_fts'
+
+    def _sqlite_sql(self, qn):
+        table, fts = qn(self.table), qn(self.name)
+        columns = ', '.join(qn(column) for column in self.columns)
+        new = ', '.join(f'new.{qn(column)}' for column in self.columns)
+        old = ', '.join(f'old.{qn(column)}' for column in self.columns)
+        delete = f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old});"
+        insert = f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new});"
+        return [
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({columns}, content='{self.table}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2')",
+            f"CREATE TRIGGER {qn(self.name + '_ai')} AFTER INSERT ON {table} BEGIN {insert} END",
+            f"CREATE TRIGGER {qn(self.name + '_ad')} AFTER DELETE ON {table} BEGIN {delete} END",
+            f"CREATE TRIGGER {qn(self.name + '_au')} AFTER UPDATE OF {columns} ON {table} "
+            f"BEGIN {delete} {insert} END",
+            f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+        ]
+
+    def _postgres_document(self, qn, qualify=False):
+        prefix = f'{qn(self.table)}.' if qualify else ''
+        parts = " || ' ' || ".join(f"coalesce({prefix}{qn(column)}, '')" for column in self.columns)
+        return f"to_tsvector('simple', {parts})"
+
+    def _drop_sql(self, qn, vendor):
+        if vendor == 'sqlite':
+            return [
+                *(f"DROP TRIGGER IF EXISTS {qn(self.name + suffix)}" for suffix in ('_ai', '_ad', '_au')),
+                f"DROP TABLE IF EXISTS {qn(self.name)}",
+            ]
+        if vendor == 'postgresql':
+            return [f"DROP INDEX IF EXISTS {qn(self.name)}"]
+        return []
+
+    def _create_sql(self, qn, vendor):
+        if vendor == 'sqlite':
+            return self._sqlite_sql(qn)
+        if vendor == 'postgresql':
+            return [f"CREATE INDEX {qn(self.name)} ON {qn(self.table)} USING gin (({self._postgres_document(qn)}))"]
+        return []
+
+    def install(self, using=connection):
+        """Create (or recreate) the index and fill it from the table."""
+        qn = using.ops.quote_name
+        with using.cursor() as cursor:
+            for sql in self._drop_sql(qn, using.vendor) + self._create_sql(qn, using.vendor):
+                cursor.execute(sql)
+
+    def uninstall(self, using=connection):
+        with using.cursor() as cursor:
+            for sql in self._drop_sql(using.ops.quote_name, using.vendor):
+                cursor.execute(sql)
+
+    def search(self, queryset, words):
+        """
+        Filter `queryset` to rows matching every word as a prefix, annotated
+        with `search_rank` (higher is better) and ordered by it. Returns
+        None when the backend has no index to use.
+        """
+        qn = connection.ops.quote_name
+        pk = f'{qn(self.table)}.{qn(queryset.model._meta.pk.column)}'
+        if connection.vendor == 'sqlite':
+            fts = qn(self.name)
+            match = ' '.join(f'"{word}"*' for word in words)
+            matches = RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [match])
+            # bm25() is lower for better matches
+            rank = RawSQL(
+                f'SELECT -bm25({fts}) FROM {fts} WHERE {fts} MATCH %s AND rowid = {pk}',
+                [match], output_field=FloatField()
+            )
+            queryset = queryset.filter(pk__in=matches)
+        elif connection.vendor == 'postgresql':
+            document = self._postgres_document(qn, qualify=True)
+            query = ' & '.join(f'{word}:*' for word in words)
+            queryset = queryset.filter(RawSQL(
+                f"{document} @@ to_tsquery('simple', %s)", [query], output_field=BooleanField()
+            ))
+            rank = RawSQL(f"ts_rank({document}, to_tsquery('simple', %s))", [query], output_field=FloatField())
+        else:
+            return None
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        return queryset.annotate(search_rank=rank).order_by('-search_rank', *ordering)
+
+
+class FullTextSearchFilter(SearchFilter):
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        words = WORD.findall(' '.join(self.get_search_terms(request)).lower())
+        if not search_fields or not words:
+            return queryset
+        index = FullTextIndex.for_model(queryset.model, search_fields)
+        results = index.search(queryset, words)
+        if results is None:
+            return super().filter_queryset(request, queryset, view)
+        return results
+
+
+class RankedOrderingFilter(OrderingFilter):
+    """OrderingFilter that keeps search results best-first unless `?ordering=` is given."""
+
+    def filter_queryset(self, request, queryset, view):
+        if 'search_rank' in queryset.query.annotations and not request.query_params.get(self.ordering_param):
+            return queryset
+        return super().filter_queryset(request, queryset, view)
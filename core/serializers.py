@@ -0,0 +1,129 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+from .metrics import timing_serialization
+
+
+def _split_param(request, name):
+    value = request.query_params.get(name, '') if request is not None else ''
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+class DynamicFieldsMixin:
+    """
+    Let the client choose which fields a serializer renders.
+
+    `?fields=id,title` limits the output to the listed fields, and
+    `?expand=event` adds the nested representations named in
+    `Meta.expandable_fields`, which are left out by default. Both only apply
+    to the top-level serializer of a response; fields that are only used for
+    input are never removed. On writes, fields that take input are kept for
+    validation and save and only left out of the response.
+    """
+
+    def _is_root(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self._is_root():
+            return fields
+
+        request = self.context.get('request')
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        expanded = {expandable[name] for name in _split_param(request, 'expand') if name in expandable}
+        requested = _split_param(request, 'fields')
+
+        writing = request is not None and request.method not in SAFE_METHODS
+        self._unrendered = set()
+        for name in list(fields):
+            if fields[name].write_only:
+                continue
+            if name in expandable.values() and name not in expanded:
+                hidden = True
+            else:
+                hidden = bool(requested) and name not in requested and name not in expanded
+            if not hidden:
+                continue
+            if writing and not fields[name].read_only:
+                self._unrendered.add(name)
+            else:
+                del fields[name]
+        return fields
+
+    def to_representation(self, instance):
+        if not self._is_root():
+            return super().to_representation(instance)
+        # Nested serializers run inside this, so only the root is timed
+        with timing_serialization():
+            data = super().to_representation(instance)
+        for name in getattr(self, '_unrendered', ()):
+            data.pop(name, None)
+        return data
+
+
+def _query_plan(serializer, prefix=''):
+    """
+    Work out the model columns and joins needed to render `serializer`.
+
+    Returns `(only, related)` lookup paths, or None when a field reads
+    something that cannot be traced back to columns. Properties can declare
+    the columns they read in `Meta.source_fields`.
+    """
+    model = serializer.Meta.model
+    source_fields = getattr(serializer.Meta, 'source_fields', {})
+    only, related = set(), set()
+
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in source_fields:
+            only.update(prefix + column for column in source_fields[name])
+            continue
+        if field.source == '*':
+            return None
+
+        current, path = model, []
+        for attr in field.source_attrs:
+            try:
+                model_field = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                return None
+            if model_field.one_to_many or model_field.many_to_many:
+                return None
+            path.append(attr)
+            lookup = prefix + '__'.join(path)
+            only.add(lookup)
+            if not (model_field.many_to_one or model_field.one_to_one):
+                break
+            if isinstance(field, serializers.ModelSerializer) and len(path) == len(field.source_attrs):
+                related.add(lookup)
+                nested = _query_plan(field, lookup + '__')
+                if nested is None:
+                    return None
+                only.update(nested[0])
+                related.update(nested[1])
+                break
+            if len(path) < len(field.source_attrs):
+                related.add(lookup)
+                current = model_field.related_model
+
+    return only, related
+
+
+def restrict_queryset(queryset, serializer):
+    """Narrow `queryset` to the columns and joins `serializer` will render."""
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    plan = _query_plan(serializer)
+    if plan is None:
+        return queryset
+    only, related = plan
+    queryset = queryset.select_related(None)
+    if related:
+        queryset = queryset.select_related(*sorted(related))
+    return queryset.only(*sorted(only))
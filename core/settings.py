@@ -1,5 +1,6 @@
 from datetime import timedelta
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -33,6 +34,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover every other middleware
+    "core.metrics.RequestMetricsMiddleware",
+    # Only active when QUERY_BUDGET_MODE is not 'off'
+    "core.querybudget.QueryBudgetMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -64,14 +69,106 @@ WSGI_APPLICATION = "core.wsgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
+# DB_PROFILE selects 'sqlite' (default) or 'postgres'.
 
-DATABASES = {
+DB_PROFILE = config('DB_PROFILE', default='sqlite')
+
+if DB_PROFILE == 'sqlite':
+    # WAL lets readers run alongside the single writer, and IMMEDIATE
+    # transactions take the write lock up front instead of failing with
+    # "database is locked" when a read transaction tries to upgrade.
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": config('DB_NAME', default=str(BASE_DIR / "db.sqlite3")),
+            "OPTIONS": {
+                "transaction_mode": "IMMEDIATE",
+                # Seconds to wait for the write lock (SQLite's busy_timeout)
+                "timeout": config('DB_TIMEOUT', default=20, cast=int),
+                "init_command": (
+                    "PRAGMA journal_mode=WAL;"
+                    "PRAGMA synchronous=NORMAL;"
+                    f"PRAGMA mmap_size={config('SQLITE_MMAP_SIZE', default=134217728, cast=int)};"
+                ),
+            },
+        }
+    }
+elif DB_PROFILE == 'postgres':
+    # Requires psycopg 3 (`pip install "psycopg[binary,pool]"`). With the
+    # pool enabled Django needs CONN_MAX_AGE=0; connections are reused
+    # through the pool instead.
+    DB_POOL = config('DB_POOL', default=True, cast=bool)
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": config('DB_NAME', default='event_booking'),
+            "USER": config('DB_USER', default='postgres'),
+            "PASSWORD": config('DB_PASSWORD', default=''),
+            "HOST": config('DB_HOST', default='localhost'),
+            "PORT": config('DB_PORT', default=5432, cast=int),
+            "CONN_MAX_AGE": 0 if DB_POOL else config('DB_CONN_MAX_AGE', default=60, cast=int),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                "pool": {
+                    "min_size": config('DB_POOL_MIN_SIZE', default=2, cast=int),
+                    "max_size": config('DB_POOL_MAX_SIZE', default=10, cast=int),
+                    "timeout": config('DB_POOL_TIMEOUT', default=10, cast=int),
+                },
+            } if DB_POOL else {},
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"Unknown DB_PROFILE {DB_PROFILE!r}, expected 'sqlite' or 'postgres'")
+
+# Cache
+# Local memory by default; point CACHE_BACKEND at e.g.
+# django.core.cache.backends.filebased.FileBasedCache or
+# django.core.cache.backends.db.DatabaseCache to share it between workers.
+
+CACHE_BACKEND = config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache')
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": config('CACHE_LOCATION', default='event-booking'),
     }
 }
 
+# Read-through cache of public event and country responses (core.cache).
+# Off by default with local memory: a write only swaps the version tokens of
+# the process that made it, so other workers would keep serving stale copies.
+RESPONSE_CACHE_ENABLED = config(
+    'RESPONSE_CACHE_ENABLED', default=not CACHE_BACKEND.endswith('.LocMemCache'), cast=bool
+)
+RESPONSE_CACHE_TTL = {
+    'countries': config('RESPONSE_CACHE_TTL_COUNTRIES', default=3600, cast=int),
+    'events': config('RESPONSE_CACHE_TTL_EVENTS', default=60, cast=int),
+}
+
+# Seconds a pending booking holds its seat before expire_holds releases it
+BOOKING_HOLD_SECONDS = config('BOOKING_HOLD_SECONDS', default=900, cast=int)
+
+# Seconds a booking write's Idempotency-Key (and its stored response) is
+# kept for replay; purge_idempotency_keys deletes expired ones
+IDEMPOTENCY_KEY_TTL = config('IDEMPOTENCY_KEY_TTL', default=86400, cast=int)
+
+# Seconds clients may cache /api/events/availability/ responses
+AVAILABILITY_MAX_AGE = config('AVAILABILITY_MAX_AGE', default=5, cast=int)
+
+# Seat-count stream (/api/async/events/stream/): the broker fanning out
+# updates, and how often idle streams send a keep-alive comment. Use
+# apps.events.streams.CacheBroker with a shared cache for several workers.
+SEAT_STREAM_BROKER = config('SEAT_STREAM_BROKER', default='apps.events.streams.InProcessBroker')
+SEAT_STREAM_KEEPALIVE = config('SEAT_STREAM_KEEPALIVE', default=15, cast=int)
+SEAT_STREAM_POLL_INTERVAL = config('SEAT_STREAM_POLL_INTERVAL', default=1.0, cast=float)
+
+# Seconds before a process re-reads its in-memory country table
+COUNTRY_REGISTRY_TTL = config('COUNTRY_REGISTRY_TTL', default=300, cast=int)
+
+# In-memory index of upcoming events behind /api/events/events/calendar/;
+# when disabled the calendar is answered from the database
+EVENT_CALENDAR_ENABLED = config('EVENT_CALENDAR_ENABLED', default=True, cast=bool)
+EVENT_CALENDAR_TTL = config('EVENT_CALENDAR_TTL', default=60, cast=int)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -115,7 +212,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Rest Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -124,6 +221,30 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20,
 }
 
+# Pagination used when a request asks for neither ?page= nor ?cursor=:
+# 'page' (page numbers with a total count) or 'cursor' (keyset pagination)
+PAGINATION_STYLE = config('PAGINATION_STYLE', default='page')
+
+# Request metrics (core.metrics, /api/_metrics/): the share of requests
+# sampled (0 turns it off) and how many recent samples per route feed the
+# percentiles
+METRICS_SAMPLE_RATE = config('METRICS_SAMPLE_RATE', default=1.0, cast=float)
+METRICS_WINDOW = config('METRICS_WINDOW', default=1024, cast=int)
+
+# Query budgets (core.querybudget): 'off', 'raise' (what the test runner
+# uses) or 'log' (staging: log offending endpoints with stack traces). A
+# request fails its budget when it runs more queries than its view declares
+# or one SQL shape more than QUERY_REPEAT_LIMIT times.
+QUERY_BUDGET_MODE = config('QUERY_BUDGET_MODE', default='off')
+QUERY_REPEAT_LIMIT = config('QUERY_REPEAT_LIMIT', default=5, cast=int)
+QUERY_SLOW_MS = config('QUERY_SLOW_MS', default=100, cast=int)
+TEST_RUNNER = 'core.querybudget.QueryBudgetRunner'
+
+# Per-process cache of authenticated users (core.authentication): seconds
+# an entry is trusted, and how many users each process keeps
+AUTH_USER_CACHE_TTL = config('AUTH_USER_CACHE_TTL', default=30, cast=int)
+AUTH_USER_CACHE_SIZE = config('AUTH_USER_CACHE_SIZE', default=1024, cast=int)
+
 # JWT settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
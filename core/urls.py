@@ -3,6 +3,7 @@ from django.urls import path, include
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
+from core.metrics import MetricsView
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -34,4 +35,10 @@ urlpatterns = [
     path('api/attendees/', include('apps.attendees.urls')),
     path('api/bookings/', include('apps.bookings.urls')),
 
+    # Async read endpoints, served without blocking under ASGI
+    path('api/async/', include('apps.events.async_urls')),
+
+    # Per-route request metrics (admin only)
+    path('api/_metrics/', MetricsView.as_view(), name='metrics'),
+
 ]
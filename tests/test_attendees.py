@@ -1,7 +1,15 @@
+import json
+import os
+import tempfile
 from datetime import timedelta, date
+from io import StringIO
 
 from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -106,6 +114,19 @@ class AttendeeTests(TestCase):
         updated_attendee = Attendee.objects.get(id=self.attendee.id)
         self.assertEqual(updated_attendee.phone, '+1555555555')
 
+    def test_writes_with_sparse_fields_save_every_field_sent(self):
+        """Test that ?fields= narrows the response of a write but not what it saves."""
+        response = self.client.post('/api/attendees/?fields=id', self.attendee_data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(set(response.data), {'id'})
+        created = Attendee.objects.get(pk=response.data['id'])
+        self.assertEqual((created.email, created.date_of_birth), ('john.doe@example.com', date(1990, 1, 1)))
+
+        response = self.client.patch(f'/api/attendees/{self.attendee.id}/?fields=id,email', {'phone': '+1555555555'})
+        self.assertEqual(response.data, {'id': self.attendee.id, 'email': 'jane.smith@example.com'})
+        self.attendee.refresh_from_db()
+        self.assertEqual(self.attendee.phone, '+1555555555')
+
     def test_delete_attendee(self):
         """Test deleting an attendee."""
         response = self.client.delete(f'/api/attendees/{self.attendee.id}/')
@@ -154,6 +175,29 @@ class AttendeeTests(TestCase):
         self.assertEqual(response.data[0]['id'], booking.id)
         self.assertEqual(response.data[0]['event'], self.event.id)
 
+    def test_attendee_bookings_query_count_is_constant(self):
+        """Test that nested event details do not trigger per-booking queries."""
+        second_event = Event.objects.create(
+            title='Second Event',
+            description='Another Description',
+            start_datetime=timezone.now() + timedelta(days=9),
+            end_datetime=timezone.now() + timedelta(days=10),
+            location=self.country,
+            capacity=10,
+            price=20.00,
+            created_by=self.user
+        )
+        Booking.objects.create(event=self.event, attendee=self.attendee)
+        Booking.objects.create(event=second_event, attendee=self.attendee, status='confirmed')
+
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                f'/api/attendees/{self.attendee.id}/bookings/?expand=event'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(response.data[0]['event_details']['location']['code'], 'US')
+
     def test_search_attendees(self):
         """Test searching attendees by name or email."""
         # Create additional attendees for search testing
@@ -221,6 +265,113 @@ class AttendeeTests(TestCase):
         self.assertIn('count', response.data)
         self.assertEqual(response.data['count'], 26)
 
+    def test_keyset_pagination(self):
+        """Test walking attendees with cursors in (last_name, first_name, id) order."""
+        for i in range(25):
+            Attendee.objects.create(
+                first_name=f'User{i:02d}',
+                last_name='Same' if i % 2 else 'Other',
+                email=f'keyset{i}@example.com',
+                phone='+1234567890',
+                date_of_birth='1990-01-01'
+            )
+        expected = list(
+            Attendee.objects.order_by('last_name', 'first_name', 'id').values_list('id', flat=True)
+        )
+
+        seen = []
+        url = '/api/attendees/?cursor=&page_size=10'
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(len(queries), 1)  # just the page
+            self.assertNotIn('COUNT(', queries[0]['sql'].upper())
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, expected)
+
+        # Walk back one page from the last one
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(
+            [item['id'] for item in response.data['results']], expected[10:20]
+        )
+
+    def test_keyset_page_answers_if_none_match_with_304(self):
+        """Test that a cursor page is validated by its own rows."""
+        url = '/api/attendees/?cursor=&page_size=10'
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertNotIn('Last-Modified', response)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.attendee.phone = '+1987654321'
+        self.attendee.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_keyset_pagination_invalid_cursor(self):
+        """Test that a tampered cursor is rejected."""
+        response = self.client.get('/api/attendees/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_import_attendees_command(self):
+        """Test importing a CSV that mixes new, duplicate and invalid rows."""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as handle:
+            handle.write('first_name,last_name,email,phone,date_of_birth\n')
+            for i in range(5):
+                handle.write(f'Row{i},Import,row{i}@example.com,+1234567890,1990-01-01\n')
+            handle.write('Again,Import,row0@example.com,+1234567890,1990-01-01\n')
+            handle.write('Known,Import,jane.smith@example.com,+1234567890,1990-01-01\n')
+            handle.write('Bad,Import,not-an-email,+1234567890,1990-01-01\n')
+        self.addCleanup(os.unlink, handle.name)
+
+        out = StringIO()
+        call_command('import_attendees', handle.name, '--batch-size', '3', stdout=out, stderr=StringIO())
+        self.assertIn('Imported 5 attendees', out.getvalue())
+        self.assertEqual(Attendee.objects.filter(last_name='Import').count(), 5)
+        self.assertEqual(Attendee.objects.get(email='jane.smith@example.com').first_name, 'Jane')
+
+    def test_import_attendees_api(self):
+        """Test the admin-only JSON Lines import endpoint."""
+        lines = [
+            {'first_name': 'Api', 'last_name': f'User{i}', 'email': f'api{i}@example.com',
+             'phone': '+1234567890', 'date_of_birth': '1990-01-01'}
+            for i in range(3)
+        ]
+        upload = SimpleUploadedFile(
+            'attendees.jsonl', '\n'.join(json.dumps(line) for line in lines).encode()
+        )
+
+        response = self.client.post('/api/attendees/import/', {'file': upload})
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+
+        admin = User.objects.create_superuser(username='admin', password='adminpass123')
+        self.client.force_authenticate(user=admin)
+        upload.seek(0)
+        response = self.client.post('/api/attendees/import/', {'file': upload})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(response.data['invalid'], 0)
+        self.assertEqual(Attendee.objects.filter(first_name='Api').count(), 3)
+
+    def test_conditional_get_with_if_modified_since(self):
+        url = f'/api/attendees/{self.attendee.id}/'
+        response = self.client.get(url)
+        last_modified = response['Last-Modified']
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Attendee.objects.filter(pk=self.attendee.pk).update(
+            updated_at=timezone.now() + timedelta(seconds=5)
+        )
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_ordering(self):
         """Test that attendees are ordered by last_name, first_name."""
         # Create attendees with different names
@@ -1,10 +1,19 @@
-from django.test import TestCase
+import threading
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework import status
 from apps.events.models import Event, Country
 from apps.attendees.models import Attendee
-from apps.bookings.models import Booking
+from apps.bookings import reservations
+from apps.bookings.exceptions import BookingException
+from apps.bookings.models import Booking, IdempotencyKey
 from datetime import datetime, timedelta
 from django.utils import timezone
 
@@ -38,6 +47,29 @@ class BookingTests(TestCase):
             date_of_birth='1990-01-01'
         )
 
+    def _book_attendees(self, count, status='pending'):
+        for i in range(count):
+            attendee = Attendee.objects.create(
+                first_name=f'Guest{i}',
+                last_name='Query',
+                email=f'guest{i}@example.com',
+                phone='1234567890',
+                date_of_birth='1990-01-01'
+            )
+            Booking.objects.create(event=self.event, attendee=attendee, status=status)
+
+    def _make_attendees(self, count):
+        return [
+            Attendee.objects.create(
+                first_name=f'Bulk{i}',
+                last_name='Group',
+                email=f'bulk{i}@example.com',
+                phone='1234567890',
+                date_of_birth='1990-01-01'
+            )
+            for i in range(count)
+        ]
+
     def test_create_booking(self):
         self.client.force_authenticate(user=self.user)
         booking_data = {
@@ -91,3 +123,596 @@ class BookingTests(TestCase):
         }
         response = self.client.post('/api/bookings/', booking_data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_update_cannot_overbook(self):
+        """Test that confirming a booking through PATCH on a full event is refused."""
+        self.client.force_authenticate(user=self.user)
+        self._book_attendees(2, status='confirmed')
+        booking = Booking.objects.create(event=self.event, attendee=self.attendee, status='cancelled')
+
+        response = self.client.patch(f'/api/bookings/{booking.id}/', {'status': 'confirmed'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['detail'], 'Event is fully booked')
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, 'cancelled')
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.confirmed_count, 2)
+
+        # A booking changed since it was loaded is not moved again
+        stale = Booking.objects.get(pk=booking.pk)
+        Booking.objects.filter(pk=booking.pk).update(status='pending')
+        with self.assertRaises(BookingException) as raised:
+            reservations.update_booking(stale, status='confirmed')
+        self.assertEqual(raised.exception.status_code, status.HTTP_409_CONFLICT)
+
+    def test_lock_contention_that_outlasts_the_retries_is_a_503(self):
+        """Test that a write still locked out after LOCK_RETRY_TIMEOUT is refused, not leaked."""
+        reservations.metrics.reset()
+        locked = OperationalError('database table is locked')
+        with patch.object(reservations, 'LOCK_RETRY_TIMEOUT', 0), \
+                patch.object(Event.objects, 'increment_confirmed', side_effect=locked):
+            with self.assertRaises(BookingException) as raised:
+                reservations.create_booking(event=self.event, attendee=self.attendee, status='confirmed')
+        self.assertEqual(raised.exception.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(reservations.metrics.snapshot()['lock_timeout'], 1)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_confirmed_count_tracks_booking_lifecycle(self):
+        """Test that confirmed_count follows confirm, cancel and delete."""
+        booking = Booking.objects.create(event=self.event, attendee=self.attendee)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.confirmed_count, 0)
+
+        booking.status = 'confirmed'
+        booking.save()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.confirmed_count, 1)
+        self.assertEqual(self.event.remaining_capacity, 1)
+
+        booking.status = 'cancelled'
+        booking.save()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.confirmed_count, 0)
+
+        booking.status = 'confirmed'
+        booking.save()
+        booking.delete()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.confirmed_count, 0)
+
+    def test_pending_bookings_hold_seats_until_they_expire(self):
+        """Test that pending bookings hold seats until expire_holds releases them."""
+        self.client.force_authenticate(user=self.user)
+        held = Booking.objects.create(event=self.event, attendee=self.attendee)
+        self.assertIsNotNone(held.hold_expires_at)
+        self._book_attendees(1)
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.held_count, self.event.remaining_capacity), (2, 0))
+
+        # Both seats are held, so nobody else can book or confirm meanwhile
+        late = Attendee.objects.create(
+            first_name='Late',
+            last_name='Comer',
+            email='late@example.com',
+            phone='1234567890',
+            date_of_birth='1990-01-01'
+        )
+        response = self.client.post('/api/bookings/', {
+            'event': self.event.id, 'attendee': late.id, 'join_waitlist': True,
+        })
+        self.assertEqual(response.data['status'], 'waitlisted')
+
+        # Confirming a hold keeps its seat
+        self.client.post(f'/api/bookings/{held.id}/confirm/')
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.confirmed_count, self.event.held_count), (1, 1))
+
+        # An expired hold frees its seat, which goes to the waitlist
+        Booking.objects.filter(status='pending').update(hold_expires_at=timezone.now() - timedelta(seconds=1))
+        out = StringIO()
+        call_command('expire_holds', stdout=out)
+        self.assertIn('Expired 1 hold(s)', out.getvalue())
+        self.assertEqual(Booking.objects.get(attendee__email='guest0@example.com').status, 'expired')
+        self.assertEqual(Booking.objects.get(pk=response.data['id']).status, 'confirmed')
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.confirmed_count, self.event.held_count), (2, 0))
+
+    def test_seat_counters_survive_holds_changing_mid_sweep(self):
+        """Test that a hold confirmed while the sweeper runs gives back its seat only once."""
+        Event.objects.filter(pk=self.event.pk).update(capacity=3)
+        self._book_attendees(3)
+        Booking.objects.exclude(attendee__email='guest2@example.com').update(
+            hold_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        raced = Booking.objects.get(attendee__email='guest0@example.com')
+
+        def confirm_during_sweep(execute, sql, params, many, context):
+            expiring = sql.startswith('UPDATE "bookings_booking"') and 'expired' in params
+            if expiring and raced.status != 'confirmed':
+                reservations.confirm_booking(raced)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(confirm_during_sweep):
+            self.assertEqual(reservations.expire_holds(), 1)
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.confirmed_count, self.event.held_count), (1, 1))
+
+    def test_cancelled_hold_with_drifted_counter_still_seats_the_waitlist(self):
+        """Test that a promotion claims its seat even when held_count was already zero."""
+        self.client.force_authenticate(user=self.user)
+        self._book_attendees(2)
+        response = self.client.post('/api/bookings/', {
+            'event': self.event.id, 'attendee': self.attendee.id, 'join_waitlist': True,
+        })
+        Event.objects.filter(pk=self.event.pk).update(held_count=0)
+
+        held = Booking.objects.get(attendee__email='guest0@example.com')
+        self.client.post(f'/api/bookings/{held.id}/cancel/')
+
+        self.assertEqual(Booking.objects.get(pk=response.data['id']).status, 'confirmed')
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.confirmed_count, self.event.held_count), (1, 0))
+
+    def test_update_cannot_hold_a_seat_on_a_full_event(self):
+        """Test that turning a cancelled booking back into a hold needs a free seat."""
+        self.client.force_authenticate(user=self.user)
+        self._book_attendees(2)
+        booking = Booking.objects.create(event=self.event, attendee=self.attendee, status='cancelled')
+
+        response = self.client.patch(f'/api/bookings/{booking.id}/', {'status': 'pending'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['detail'], 'This event is fully booked')
+
+        Booking.objects.filter(attendee__email='guest0@example.com').delete()
+        response = self.client.patch(f'/api/bookings/{booking.id}/', {'status': 'pending'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(response.data['hold_expires_at'])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.held_count, 2)
+
+    def test_event_update_does_not_overwrite_confirmed_count(self):
+        """Test that saving a stale Event keeps the stored seat counters."""
+        stale_event = Event.objects.get(pk=self.event.pk)
+        Booking.objects.create(event=self.event, attendee=self.attendee, status='confirmed')
+
+        stale_event.title = 'Renamed Event'
+        stale_event.save()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.title, 'Renamed Event')
+        self.assertEqual(self.event.confirmed_count, 1)
+
+    def test_reconcile_confirmed_counts_command(self):
+        """Test that reconcile_confirmed_counts rebuilds drifted counters."""
+        Booking.objects.create(event=self.event, attendee=self.attendee, status='confirmed')
+        Event.objects.filter(pk=self.event.pk).update(confirmed_count=2, held_count=1)
+
+        call_command('reconcile_confirmed_counts', stdout=StringIO())
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.confirmed_count, 1)
+        self.assertEqual(self.event.held_count, 0)
+
+    def test_list_bookings_query_count_is_constant(self):
+        """Test that listing bookings costs the same queries for any page size."""
+        self.client.force_authenticate(user=self.user)
+        self._book_attendees(2, status='confirmed')
+
+        # Validators, one COUNT for pagination and one joined SELECT
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/bookings/?expand=event,attendee')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(response.data['results'][0]['event_details']['remaining_capacity'], 0)
+
+        other_event = Event.objects.create(
+            title='Other Event',
+            description='Another one',
+            start_datetime=timezone.now() + timedelta(days=9),
+            end_datetime=timezone.now() + timedelta(days=10),
+            location=self.country,
+            capacity=5,
+            price=10.00,
+            created_by=self.user
+        )
+        Booking.objects.create(event=other_event, attendee=self.attendee)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/bookings/?expand=event,attendee')
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_event_bookings_query_count_is_constant(self):
+        """Test that an event's bookings render in a constant number of queries."""
+        self._book_attendees(2)
+
+        # One query for the event and one joined SELECT for its bookings
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                f'/api/events/events/{self.event.id}/bookings/?expand=event,attendee'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+    def test_bookings_return_ids_unless_expanded(self):
+        """Test that related objects are ids unless ?expand= asks for details."""
+        self.client.force_authenticate(user=self.user)
+        booking = Booking.objects.create(event=self.event, attendee=self.attendee)
+
+        response = self.client.get(f'/api/bookings/{booking.id}/')
+        self.assertEqual(response.data['event'], self.event.id)
+        self.assertNotIn('event_details', response.data)
+        self.assertNotIn('attendee_details', response.data)
+
+        response = self.client.get(f'/api/bookings/{booking.id}/?expand=attendee')
+        self.assertEqual(response.data['attendee_details']['email'], 'john@example.com')
+        self.assertNotIn('event_details', response.data)
+
+    def test_sparse_fields_fetch_only_requested_columns(self):
+        """Test that ?fields= narrows the SELECT to the requested columns."""
+        self.client.force_authenticate(user=self.user)
+        Booking.objects.create(event=self.event, attendee=self.attendee)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/bookings/?fields=id,status')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'status'})
+        columns = queries.captured_queries[-1]['sql'].split(' FROM ')[0]
+        self.assertEqual(columns, 'SELECT "bookings_booking"."id", "bookings_booking"."status"')
+
+    def test_keyset_pagination_newest_first(self):
+        """Test that keyset pages walk every booking once, newest first."""
+        self.client.force_authenticate(user=self.user)
+        self._book_attendees(5, status='cancelled')
+        expected = list(
+            Booking.objects.order_by('-booking_date', 'id').values_list('id', flat=True)
+        )
+
+        seen = []
+        url = '/api/bookings/?cursor=&page_size=2'
+        while url:
+            response = self.client.get(url)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, expected)
+
+    def test_bulk_booking_reports_per_item_results(self):
+        """Test that a bulk booking reports a result per item."""
+        self.client.force_authenticate(user=self.user)
+        Booking.objects.create(event=self.event, attendee=self.attendee, status='cancelled')
+        group = self._make_attendees(3)
+
+        response = self.client.post('/api/bookings/bulk/', {
+            'bookings': [
+                {'event': self.event.id, 'attendee': self.attendee.id},
+                *({'event': self.event.id, 'attendee': a.id, 'status': 'confirmed'} for a in group),
+            ]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data['created'], 2)
+        results = response.data['results']
+        self.assertEqual(results[0]['error'], 'Attendee has already booked this event')
+        self.assertTrue(results[1]['created'])
+        self.assertTrue(results[2]['created'])
+        self.assertEqual(results[3]['error'], 'This event is fully booked')
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.confirmed_count, 2)
+        self.assertEqual(Booking.objects.filter(event=self.event, status='confirmed').count(), 2)
+
+    def test_bulk_booking_all_or_nothing(self):
+        """Test that all_or_nothing creates nothing when an item fails."""
+        self.client.force_authenticate(user=self.user)
+        group = self._make_attendees(3)
+
+        response = self.client.post('/api/bookings/bulk/', {
+            'bookings': [{'event': self.event.id, 'attendee': a.id, 'status': 'confirmed'} for a in group],
+            'all_or_nothing': True,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['created'], 0)
+        self.assertFalse(Booking.objects.exists())
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.confirmed_count, 0)
+
+    def test_bulk_booking_query_count_does_not_grow_with_size(self):
+        """Test that bulk booking runs the same queries for any group size."""
+        self.client.force_authenticate(user=self.user)
+        self.event.capacity = 50
+        self.event.save()
+        group = self._make_attendees(10)
+
+        counts = []
+        for url, chunk in (
+            ('/api/bookings/bulk/', group[:2]),
+            ('/api/bookings/bulk/', group[2:6]),
+            ('/api/bookings/bulk/?expand=event,attendee', group[6:7]),
+            ('/api/bookings/bulk/?expand=event,attendee', group[7:]),
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url, {
+                    'bookings': [{'event': self.event.id, 'attendee': a.id} for a in chunk],
+                }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(counts[2], counts[3])
+        booking = response.data['results'][0]['booking']
+        self.assertEqual(booking['event_details']['id'], self.event.id)
+        self.assertEqual(booking['attendee_details']['id'], group[7].id)
+
+    def test_conditional_get_skips_serialization(self):
+        """Test that If-None-Match is answered with a 304 before serializing."""
+        self.client.force_authenticate(user=self.user)
+        booking = Booking.objects.create(event=self.event, attendee=self.attendee)
+        url = f'/api/bookings/{booking.id}/?expand=event'
+
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Confirming changes the booking and the expanded event's seat count
+        self.client.post(f'/api/bookings/{booking.id}/confirm/')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['event_details']['remaining_capacity'], 1)
+
+        # Deleting a row changes the list validators even though no row was updated
+        response = self.client.get('/api/bookings/')
+        etag = response['ETag']
+        booking.delete()
+        response = self.client.get('/api/bookings/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_waitlist_is_promoted_in_order_on_cancel(self):
+        """Test that cancelling hands the seat to the waitlist in order."""
+        self.client.force_authenticate(user=self.user)
+        self._book_attendees(2, status='confirmed')
+        waiting = []
+        for i in range(2):
+            attendee = Attendee.objects.create(
+                first_name=f'Waiting{i}',
+                last_name='Line',
+                email=f'waiting{i}@example.com',
+                phone='1234567890',
+                date_of_birth='1990-01-01'
+            )
+            response = self.client.post('/api/bookings/', {
+                'event': self.event.id, 'attendee': attendee.id, 'join_waitlist': True,
+            })
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(response.data['status'], 'waitlisted')
+            self.assertEqual(response.data['waitlist_position'], i + 1)
+            waiting.append(response.data['id'])
+
+        # Without opting in, a full event still refuses the booking
+        response = self.client.post('/api/bookings/', {'event': self.event.id, 'attendee': self.attendee.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(f'/api/bookings/{waiting[0]}/confirm/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        confirmed = Booking.objects.filter(event=self.event, status='confirmed').first()
+        response = self.client.post(f'/api/bookings/{confirmed.id}/cancel/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        promoted = Booking.objects.get(pk=waiting[0])
+        self.assertEqual((promoted.status, promoted.waitlist_position), ('confirmed', None))
+        self.assertEqual(Booking.objects.get(pk=waiting[1]).waitlist_position, 2)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.confirmed_count, 2)
+
+        # Leaving the waitlist frees no seat and promotes nobody
+        self.client.post(f'/api/bookings/{waiting[1]}/cancel/')
+        self.assertEqual(Booking.objects.filter(status='waitlisted').count(), 0)
+        self.client.post(f'/api/bookings/{promoted.id}/cancel/')
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.confirmed_count, 1)
+
+    def test_waitlist_is_promoted_on_delete_and_patch(self):
+        """Test that seats freed by DELETE or a cancelling PATCH go to the waitlist, not a newcomer."""
+        self.client.force_authenticate(user=self.user)
+        self._book_attendees(2, status='confirmed')
+        waiting = []
+        for i in range(2):
+            attendee = Attendee.objects.create(
+                first_name=f'Waiting{i}',
+                last_name='Line',
+                email=f'waiting{i}@example.com',
+                phone='1234567890',
+                date_of_birth='1990-01-01'
+            )
+            response = self.client.post('/api/bookings/', {
+                'event': self.event.id, 'attendee': attendee.id, 'join_waitlist': True,
+            })
+            waiting.append(response.data['id'])
+        first, second = Booking.objects.filter(event=self.event, status='confirmed')
+
+        response = self.client.delete(f'/api/bookings/{first.id}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Booking.objects.get(pk=waiting[0]).status, 'confirmed')
+
+        response = self.client.patch(f'/api/bookings/{second.id}/', {'status': 'cancelled'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Booking.objects.get(pk=waiting[1]).status, 'confirmed')
+
+        # Both seats went down the line, so a newcomer is still refused
+        response = self.client.post('/api/bookings/', {'event': self.event.id, 'attendee': self.attendee.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.confirmed_count, 2)
+
+        # Nor can a waitlisted booking confirm itself ahead of the line
+        response = self.client.post('/api/bookings/', {
+            'event': self.event.id, 'attendee': self.attendee.id, 'join_waitlist': True,
+        })
+        response = self.client.patch(f'/api/bookings/{response.data["id"]}/', {'status': 'confirmed'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['detail'], 'Waitlisted bookings are confirmed when a seat frees up')
+
+    def test_waitlisted_booking_moved_to_another_event_joins_the_back_of_its_line(self):
+        """Test that changing the event of a waitlisted booking gives it a place in the new waitlist."""
+        self.client.force_authenticate(user=self.user)
+        self._book_attendees(2, status='confirmed')
+        other = Event.objects.create(
+            title='Other Event',
+            description='Test Description',
+            start_datetime=timezone.now() + timedelta(days=7),
+            end_datetime=timezone.now() + timedelta(days=8),
+            location=self.country,
+            capacity=0,
+            price=50.00,
+            created_by=self.user
+        )
+        first, second = self._make_attendees(2)
+        ahead = reservations.create_booking(event=other, attendee=first, join_waitlist=True)
+        moving = reservations.create_booking(event=self.event, attendee=second, join_waitlist=True)
+        self.assertEqual(ahead.waitlist_position, moving.waitlist_position)
+
+        response = self.client.patch(f'/api/bookings/{moving.id}/', {'event': other.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        moving.refresh_from_db()
+        self.assertEqual(moving.status, 'waitlisted')
+        self.assertGreater(moving.waitlist_position, ahead.waitlist_position)
+
+    def test_deleting_an_attendee_releases_their_seats_together(self):
+        """Test that deleting an attendee gives back all their seats without a query per booking."""
+        self.client.force_authenticate(user=self.user)
+        events = [self.event] + [
+            Event.objects.create(
+                title=f'Extra Event {i}',
+                description='Test Description',
+                start_datetime=timezone.now() + timedelta(days=7),
+                end_datetime=timezone.now() + timedelta(days=8),
+                location=self.country,
+                capacity=1,
+                price=50.00,
+                created_by=self.user
+            )
+            for i in range(6)
+        ]
+        for event in events:
+            reservations.create_booking(event=event, attendee=self.attendee, status='confirmed')
+        waiter = self._make_attendees(1)[0]
+        waiting = reservations.create_booking(event=events[1], attendee=waiter, join_waitlist=True)
+        self.assertEqual(waiting.status, 'waitlisted')
+
+        response = self.client.delete(f'/api/attendees/{self.attendee.id}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        counts = dict(Event.objects.values_list('pk', 'confirmed_count'))
+        self.assertEqual(counts, {event.pk: 1 if event == events[1] else 0 for event in events})
+        self.assertEqual(Booking.objects.get(pk=waiting.pk).status, 'confirmed')
+
+    def test_idempotency_key_replays_the_stored_response(self):
+        """Test that a retried request with the same Idempotency-Key is replayed."""
+        self.client.force_authenticate(user=self.user)
+        data = {'event': self.event.id, 'attendee': self.attendee.id}
+        first = self.client.post('/api/bookings/', data, HTTP_IDEMPOTENCY_KEY='retry-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        with self.assertNumQueries(1):  # just the key lookup
+            retry = self.client.post('/api/bookings/', data, HTTP_IDEMPOTENCY_KEY='retry-1')
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Booking.objects.count(), 1)
+
+        # Without a key the retry is handled afresh and refused
+        response = self.client.post('/api/bookings/', data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Reusing the key for another request is an error
+        response = self.client.post(f'/api/bookings/{first.data["id"]}/confirm/', HTTP_IDEMPOTENCY_KEY='retry-1')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        for _ in range(2):
+            response = self.client.post(f'/api/bookings/{first.data["id"]}/cancel/', HTTP_IDEMPOTENCY_KEY='cancel-1')
+            self.assertEqual(response.data['status'], 'cancelled')
+
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        call_command('purge_idempotency_keys', stdout=StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class ReservationConcurrencyTests(TransactionTestCase):
+    """Hammer one event from many threads and make sure it is never oversold."""
+
+    THREADS = 20
+    CAPACITY = 5
+
+    def setUp(self):
+        user = User.objects.create_user(username='stress', password='testpass123')
+        country = Country.objects.create(name='United States', code='US')
+        self.event = Event.objects.create(
+            title='Popular Event',
+            description='Everyone wants in',
+            start_datetime=timezone.now() + timedelta(days=7),
+            end_datetime=timezone.now() + timedelta(days=8),
+            location=country,
+            capacity=self.CAPACITY,
+            price=10.00,
+            created_by=user
+        )
+        self.attendees = [
+            Attendee.objects.create(
+                first_name=f'User{i}',
+                last_name='Stress',
+                email=f'stress{i}@example.com',
+                phone='1234567890',
+                date_of_birth='1990-01-01'
+            )
+            for i in range(self.THREADS)
+        ]
+        reservations.metrics.reset()
+
+    def _run_concurrently(self, work):
+        barrier = threading.Barrier(self.THREADS)
+        outcomes = []
+
+        def worker(attendee):
+            barrier.wait()
+            try:
+                work(attendee)
+                outcomes.append('ok')
+            except BookingException:
+                outcomes.append('rejected')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(a,)) for a in self.attendees]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_concurrent_confirmed_bookings_never_oversell(self):
+        """Test that concurrent confirmed bookings never exceed capacity."""
+        outcomes = self._run_concurrently(
+            lambda attendee: reservations.create_booking(
+                event=self.event,
+                attendee=attendee,
+                status='confirmed'
+            )
+        )
+
+        self.event.refresh_from_db()
+        confirmed = Booking.objects.filter(event=self.event, status='confirmed').count()
+        self.assertEqual(outcomes.count('ok'), self.CAPACITY)
+        self.assertEqual(confirmed, self.CAPACITY)
+        self.assertEqual(self.event.confirmed_count, self.CAPACITY)
+        self.assertEqual(reservations.metrics.snapshot()['sold_out'], self.THREADS - self.CAPACITY)
+
+    def test_concurrent_confirms_never_oversell(self):
+        """Test that concurrent confirmations never exceed capacity."""
+        # Cancelled bookings hold no seat, so confirming them races for one
+        bookings = {
+            attendee.pk: Booking.objects.create(event=self.event, attendee=attendee, status='cancelled')
+            for attendee in self.attendees
+        }
+        outcomes = self._run_concurrently(
+            lambda attendee: reservations.confirm_booking(bookings[attendee.pk])
+        )
+
+        self.event.refresh_from_db()
+        confirmed = Booking.objects.filter(event=self.event, status='confirmed').count()
+        self.assertEqual(outcomes.count('ok'), self.CAPACITY)
+        self.assertEqual(confirmed, self.CAPACITY)
+        self.assertEqual(self.event.confirmed_count, self.CAPACITY)
@@ -1,12 +1,30 @@
+import asyncio
+import csv
+import io
+import json
 from datetime import timedelta
+from unittest.mock import patch
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient, AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from apps.attendees.models import Attendee
+from apps.bookings.models import Booking
+from apps.events.async_views import seat_stream
+from apps.events.calendar import EventCalendar
 from apps.events.models import Event, Country
+from apps.events.registry import CountryRegistry
+from apps.events.streams import CacheBroker, InProcessBroker, seat_message
+from apps.events.views import EventViewSet
+from core.metrics import metrics
+from core.querybudget import QueryBudgetExceeded, query_budget
 
 
 class EventTests(TestCase):
@@ -40,6 +58,24 @@ class EventTests(TestCase):
         response = self.client.post('/api/events/events/', self.event_data)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
+    def test_jwt_users_are_cached_until_they_change(self):
+        other = User.objects.create_user(username='other', password='testpass123')
+        event = self._create_event('Owned Event')
+        token = self.client.post('/api/token/', {'username': 'other', 'password': 'testpass123'}).data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        self.client.patch(f'/api/events/events/{event.id}/', {'title': 'Warm-up'})
+        # Neither the user nor the event's creator is fetched
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(f'/api/events/events/{event.id}/', {'title': 'Taken'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(any('FROM "auth_user"' in query['sql'] for query in queries.captured_queries))
+
+        other.is_active = False
+        other.save()
+        response = self.client.get('/api/bookings/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
     def test_list_events(self):
         response = self.client.get('/api/events/events/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -50,3 +86,444 @@ class EventTests(TestCase):
         invalid_data['end_datetime'] = invalid_data['start_datetime']
         response = self.client.post('/api/events/events/', invalid_data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def _create_event(self, title, capacity=10, **kwargs):
+        kwargs.setdefault('location', self.country)
+        return Event.objects.create(
+            title=title,
+            description='Test Description',
+            start_datetime=timezone.now() + timedelta(days=7),
+            end_datetime=timezone.now() + timedelta(days=8),
+            capacity=capacity,
+            price=50.00,
+            created_by=self.user,
+            **kwargs
+        )
+
+    def test_available_events_filters_in_sql(self):
+        open_event = self._create_event('Open Event')
+        self._create_event('Inactive Event', is_active=False)
+        full_event = self._create_event('Full Event', capacity=1)
+        Event.objects.filter(pk=full_event.pk).update(confirmed_count=1)
+
+        # One COUNT for pagination and one SELECT, no per-event queries
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/events/events/available/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['id'], open_event.id)
+        self.assertEqual(response.data['results'][0]['remaining_capacity'], 10)
+
+    def test_list_events_query_count_is_constant(self):
+        for i in range(5):
+            self._create_event(f'Event {i}')
+
+        # Validators, one COUNT for pagination and one joined SELECT
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/events/events/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['created_by'], 'testuser')
+        self.assertEqual(response.data['results'][0]['location']['code'], 'US')
+
+    def test_query_budgets_catch_repeats_and_regressions(self):
+        for i in range(3):
+            self._create_event(f'Event {i}')
+
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'ran 3 times (limit 2)'):
+            with query_budget(max_repeats=2):
+                for event in Event.objects.all():
+                    event.location.name
+        with self.assertRaisesMessage(QueryBudgetExceeded, '3 queries, budget is 2'):
+            with query_budget(max_queries=2):
+                list(Event.objects.all())
+                list(Event.objects.all())
+                list(Country.objects.all())
+
+        # The test runner fails any request over its view's budget
+        with patch.object(EventViewSet, 'query_budgets', {'list': 2}):
+            with self.assertRaisesMessage(QueryBudgetExceeded, 'event-list'):
+                self.client.get('/api/events/events/')
+
+        # Staging logs it instead, with the stack that ran the query
+        with self.settings(QUERY_BUDGET_MODE='log'), patch.object(EventViewSet, 'query_budgets', {'list': 2}):
+            with self.assertLogs('core.querybudget', 'WARNING') as logs:
+                response = APIClient().get('/api/events/events/?ordering=price')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('3 queries, budget is 2', logs.output[0])
+        self.assertIn('core/pagination.py', logs.output[0])
+        self.assertNotIn('unittest', logs.output[0])
+
+    async def test_query_budgets_see_async_view_queries(self):
+        await sync_to_async(self._create_event)('Async Event')
+
+        # Every query counts as slow here, so each one the view runs is logged
+        with self.settings(QUERY_BUDGET_MODE='log', QUERY_SLOW_MS=-1):
+            with self.assertLogs('core.querybudget', 'WARNING') as logs:
+                response = await AsyncClient().get('/api/async/events/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(any('async-event-list' in line and 'events_event' in line for line in logs.output))
+
+    def test_search_uses_ranked_full_text_index(self):
+        jazz = self._create_event('Jazz Night')
+        self._create_event('Rock Evening')
+        mention = self._create_event('Quiz Evening')
+        Event.objects.filter(pk=mention.pk).update(description='Some jazz between rounds')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/events/events/?search=jaz')
+        self.assertEqual([row['id'] for row in response.data['results']], [jazz.id, mention.id])
+        self.assertNotIn('LIKE', queries.captured_queries[-1]['sql'])
+
+        # Triggers keep the index in step with edits and deletes
+        Event.objects.filter(pk=mention.pk).update(title='Jazz Quiz Evening')
+        jazz.delete()
+        response = self.client.get('/api/events/events/?search=jazz quiz')
+        self.assertEqual([row['id'] for row in response.data['results']], [mention.id])
+
+        response = self.client.get('/api/events/events/?search=jazz&ordering=-start_datetime')
+        self.assertEqual(response.data['count'], 1)
+
+        call_command('rebuild_search_indexes', stdout=io.StringIO())
+        response = self.client.get('/api/events/events/?search=evening')
+        self.assertEqual(response.data['count'], 2)
+
+    def test_keyset_pages_keep_their_own_order(self):
+        mention = self._create_event('Quiz Evening')
+        Event.objects.filter(pk=mention.pk).update(description='Some jazz between rounds')
+        jazz = self._create_event('Jazz Night')
+
+        response = self.client.get('/api/events/events/?cursor=&ordering=-price')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ordering', response.data)
+        response = self.client.get('/api/events/events/?cursor=&ordering=start_datetime')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Search results are walked by start time, not best match first
+        response = self.client.get('/api/events/events/?cursor=&search=jazz')
+        self.assertEqual([row['id'] for row in response.data['results']], [mention.id, jazz.id])
+        response = self.client.get('/api/events/events/?page=1&search=jazz')
+        self.assertEqual([row['id'] for row in response.data['results']], [jazz.id, mention.id])
+
+    def test_range_and_multi_country_filters(self):
+        france = Country.objects.create(name='France', code='FR')
+        germany = Country.objects.create(name='Germany', code='DE')
+        soon = self._create_event('Soon', capacity=5)
+        later = self._create_event('Later', location=france)
+        Event.objects.filter(pk=later.pk).update(
+            start_datetime=soon.start_datetime + timedelta(days=30),
+            end_datetime=soon.end_datetime + timedelta(days=30),
+            price=10,
+        )
+        self._create_event('Elsewhere', location=germany)
+        Event.objects.filter(pk=soon.pk).update(confirmed_count=4)
+
+        def ids(query):
+            response = self.client.get(f'/api/events/events/?{query}')
+            self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+            return {row['id'] for row in response.data['results']}
+
+        self.assertEqual(ids(f'location={self.country.id},{france.id}'), {soon.id, later.id})
+        self.assertEqual(ids('country=us,FR'), {soon.id, later.id})
+        start = (soon.start_datetime + timedelta(days=1)).isoformat().replace('+00:00', 'Z')
+        self.assertEqual(ids(f'country=FR,US&start_datetime__gte={start}'), {later.id})
+        self.assertEqual(ids('price__lte=20'), {later.id})
+        self.assertEqual(ids('remaining_capacity__lte=1'), {soon.id})
+
+    def test_calendar_answers_from_the_in_memory_index(self):
+        france = Country.objects.create(name='France', code='FR')
+        event = self._create_event('Weekend Fair', location=france)
+        self._create_event('Local Meetup')
+        window = {
+            'start': (event.start_datetime + timedelta(hours=1)).isoformat(),
+            'end': (event.start_datetime + timedelta(hours=2)).isoformat(),
+        }
+
+        self.client.get('/api/events/events/calendar/', window)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/events/events/calendar/', {**window, 'location': france.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['id'] for row in response.data], [event.id])
+
+        # Saving an event rebuilds the index
+        event.is_active = False
+        event.save()
+        response = self.client.get('/api/events/events/calendar/', window)
+        self.assertEqual(len(response.data), 1)
+        with self.settings(EVENT_CALENDAR_ENABLED=False):
+            response = self.client.get('/api/events/events/calendar/', window)
+        self.assertEqual(len(response.data), 1)
+
+        window['end'] = (event.start_datetime + timedelta(days=100)).isoformat()
+        response = self.client.get('/api/events/events/calendar/', window)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # An Event saved by another thread right after a reload does not break readers
+        index = EventCalendar()
+        reload = index.reload
+
+        def reload_then_invalidate():
+            table = reload()
+            index.invalidate()
+            return table
+
+        index.reload = reload_then_invalidate
+        entries = index.between(event.start_datetime, event.end_datetime)
+        self.assertEqual([entry.title for entry in entries], ['Local Meetup'])
+
+    def test_sparse_event_fields(self):
+        event = self._create_event('Sparse Event')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                f'/api/events/events/{event.id}/?fields=id,title,remaining_capacity'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'id': event.id, 'title': 'Sparse Event', 'remaining_capacity': 10})
+        self.assertNotIn('description', queries.captured_queries[-1]['sql'])
+
+    def test_export_event_bookings_streams_csv_and_ndjson(self):
+        event = self._create_event('Export Event')
+        for i in range(3):
+            attendee = Attendee.objects.create(
+                first_name=f'Export{i}',
+                last_name='User',
+                email=f'export{i}@example.com',
+                phone='1234567890',
+                date_of_birth='1990-01-01'
+            )
+            Booking.objects.create(event=event, attendee=attendee)
+
+        response = self.client.get(f'/api/events/events/{event.id}/bookings/?export=csv')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0][:3], ['id', 'event', 'event_title'])
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][2], 'Export Event')
+
+        response = self.client.get(f'/api/events/events/{event.id}/bookings/?export=ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json.loads(lines[0])['attendee_email'], 'export0@example.com')
+
+        response = self.client.get(f'/api/events/events/{event.id}/bookings/?export=xml')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RESPONSE_CACHE_ENABLED=True)
+    def test_event_responses_are_cached_and_invalidated(self):
+        event = self._create_event('Cached Event', capacity=2)
+        url = f'/api/events/events/{event.id}/'
+
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(json.loads(response.content)['remaining_capacity'], 2)
+
+        # Confirming a booking changes remaining_capacity, so the entry is dropped
+        attendee = Attendee.objects.create(
+            first_name='Cache',
+            last_name='Buster',
+            email='cache@example.com',
+            phone='1234567890',
+            date_of_birth='1990-01-01'
+        )
+        booking = Booking.objects.create(event=event, attendee=attendee)
+        self.client.force_authenticate(user=self.user)
+        self.client.post(f'/api/bookings/{booking.id}/confirm/')
+        self.client.force_authenticate(user=None)
+
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['remaining_capacity'], 1)
+
+    @override_settings(RESPONSE_CACHE_ENABLED=True)
+    def test_cached_list_answers_if_none_match_with_304(self):
+        self._create_event('Tagged Event')
+
+        response = self.client.get('/api/events/events/')
+        etag = response['ETag']
+        response = self.client.get('/api/events/events/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self._create_event('Another Event')
+        response = self.client.get('/api/events/events/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+
+    def test_locations_come_from_the_country_registry(self):
+        event = self._create_event('Registry Event')
+        self.country.name = 'United States of America'
+        self.country.save()
+
+        with self.settings(RESPONSE_CACHE_ENABLED=False), \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/events/events/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['location']['name'], 'United States of America')
+        self.assertFalse(any('events_country' in query['sql'] for query in queries))
+
+        self.client.force_authenticate(user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(f'/api/events/events/{event.id}/', {'location_id': self.country.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any('events_country' in query['sql'] for query in queries))
+
+        response = self.client.patch(f'/api/events/events/{event.id}/', {'location_id': 9999})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # A country saved by another thread while one is looked up does not break the lookup
+        registry = CountryRegistry()
+        registry.reload()
+        france = Country.objects.create(name='France', code='FR')
+        table = registry._table
+
+        def table_then_invalidate():
+            countries = table()
+            registry.invalidate()
+            return countries
+
+        registry._table = table_then_invalidate
+        self.assertEqual(registry.get(france.pk), france)
+
+    async def test_async_read_endpoints_match_sync_views(self):
+        event = await sync_to_async(self._create_event)('Async Event', capacity=3)
+        await sync_to_async(self._create_event)('Inactive Event', is_active=False)
+
+        sync_response = await sync_to_async(self.client.get)('/api/events/events/?fields=id,title,location')
+        response = await self.async_client.get('/api/async/events/?fields=id,title,location')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), json.loads(sync_response.content))
+
+        response = await self.async_client.get('/api/async/events/available/')
+        self.assertEqual([item['id'] for item in response.json()['results']], [event.id])
+
+        response = await self.async_client.get(f'/api/async/events/{event.id}/')
+        self.assertEqual(response.json()['location']['code'], 'US')
+        self.assertEqual(response.json()['remaining_capacity'], 3)
+
+        response = await self.async_client.get(f'/api/async/events/{event.id}/capacity/')
+        self.assertEqual(response.json(), {
+            'id': event.id,
+            'capacity': 3,
+            'confirmed_bookings': 0,
+            'held_seats': 0,
+            'remaining_capacity': 3,
+            'is_fully_booked': False,
+        })
+
+        response = await self.async_client.get('/api/async/events/999/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = await self.async_client.get('/api/async/events/?location=999')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = await self.async_client.post('/api/async/events/')
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    async def test_request_metrics_are_recorded_per_route(self):
+        metrics.reset()
+        event = await sync_to_async(self._create_event)('Measured Event')
+        for _ in range(2):
+            listing = await sync_to_async(self.client.get)('/api/events/events/')
+        await self.async_client.get(f'/api/async/events/{event.id}/capacity/')
+
+        response = await sync_to_async(self.client.get)('/api/_metrics/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        admin = await sync_to_async(User.objects.create_superuser)('admin', 'admin@example.com', 'admin')
+        self.client.force_authenticate(user=admin)
+
+        routes = (await sync_to_async(self.client.get)('/api/_metrics/')).json()['routes']
+        self.assertEqual(routes['event-list']['requests'], 2)
+        self.assertEqual(routes['event-list']['db_queries']['p50'], 3)
+        self.assertEqual(routes['event-list']['response_bytes']['max'], len(listing.content))
+        self.assertGreater(routes['event-list']['serialize_ms']['max'], 0)
+        # Queries the async ORM runs in a worker thread are counted too
+        self.assertEqual(routes['async-event-capacity']['db_queries']['max'], 1)
+
+        response = await sync_to_async(self.client.get)('/api/_metrics/?format=prometheus')
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertIn('api_request_db_queries_count{route="event-list"} 2', response.content.decode())
+
+    def test_availability_returns_seat_counters_in_one_query(self):
+        open_event = self._create_event('Open Event', capacity=2)
+        full_event = self._create_event('Full Event', capacity=1)
+        attendee = Attendee.objects.create(
+            first_name='Seat',
+            last_name='Taker',
+            email='seat@example.com',
+            phone='1234567890',
+            date_of_birth='1990-01-01'
+        )
+        Booking.objects.create(event=full_event, attendee=attendee, status='confirmed')
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/events/availability/?ids={full_event.id},{open_event.id},999')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [
+            {'id': open_event.id, 'remaining_capacity': 2, 'is_fully_booked': False},
+            {'id': full_event.id, 'remaining_capacity': 0, 'is_fully_booked': True},
+        ])
+        self.assertIn('max-age=5', response['Cache-Control'])
+
+        response = self.client.get('/api/events/availability/?ids=1,abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_seat_stream_pushes_booking_changes(self):
+        event = await sync_to_async(self._create_event)('Streamed Event', capacity=2)
+        request = AsyncRequestFactory().get(f'/api/async/events/stream/?ids={event.id}')
+        response = await seat_stream(request)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b'retry: 3000\n\n')
+        self.assertIn(b'"remaining_capacity":2', await anext(chunks))
+
+        def book():
+            attendee = Attendee.objects.create(
+                first_name='Live',
+                last_name='Viewer',
+                email='live@example.com',
+                phone='1234567890',
+                date_of_birth='1990-01-01'
+            )
+            with self.captureOnCommitCallbacks(execute=True):
+                Booking.objects.create(event=event, attendee=attendee, status='confirmed')
+
+        await sync_to_async(book)()
+        chunk = await asyncio.wait_for(anext(chunks), timeout=5)
+        self.assertEqual(
+            chunk,
+            f'event: seats\ndata: {{"id":{event.id},"remaining_capacity":1,"is_fully_booked":false}}\n\n'.encode()
+        )
+        await chunks.aclose()
+
+    async def test_cache_subscriptions_skip_counts_published_before_they_started(self):
+        broker = CacheBroker()
+        broker.poll_interval = 0.01
+        broker.publish([seat_message(1, 5, 1)])
+        subscription = broker.subscribe({1})
+        await subscription.prime()
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(subscription.get(), timeout=0.1)
+
+        broker.publish([seat_message(1, 5, 2)])
+        messages = await asyncio.wait_for(subscription.get(), timeout=5)
+        self.assertEqual(messages, [{'id': 1, 'remaining_capacity': 3, 'is_fully_booked': False}])
+
+    async def test_slow_subscribers_only_get_the_latest_count(self):
+        broker = InProcessBroker()
+        subscription = broker.subscribe({1, 2})
+        self.assertEqual(broker.wanted({1, 3}), {1})
+
+        broker.publish([seat_message(1, 5, 1), seat_message(2, 5, 5)])
+        broker.publish([seat_message(1, 5, 2)])
+        await asyncio.sleep(0)
+        messages = await subscription.get()
+        self.assertEqual(messages, [
+            {'id': 1, 'remaining_capacity': 3, 'is_fully_booked': False},
+            {'id': 2, 'remaining_capacity': 0, 'is_fully_booked': True},
+        ])
+        self.assertEqual(subscription.coalesced, 1)
+
+        broker.unsubscribe(subscription)
+        self.assertEqual(broker.wanted({1, 2}), set())